@@ -0,0 +1,234 @@
+# 群組入口管制：放在 handle_message 前面，避免打王時洗版拖垮整個服務
+#   1. 每個群組一個 token bucket 加一條有上限的隊伍，由 worker 依序處理；webhook 執行緒只負責排入，
+#      所以洗版的群組只會塞住自己的隊伍（滿了直接丟棄），不會拖慢其他群組或 LINE 的 200 回應
+#   2. 短時間內相同的查詢指令（出 / kb all / alias list）只算一次，結果共用給每個回覆
+#   3. 短時間內重複回報同一筆擊殺，只寫一次資料庫，後面的直接回同一則訊息
+# 共用的查詢結果綁定群組資料版本號，期間有任何寫入就重新計算；
+# 擊殺只綁定 clear all 次數與別名版本，其他 BOSS 的擊殺、kb all 回寫都不影響去重
+import os
+import threading
+import time
+from collections import deque
+
+import state
+
+
+GROUP_RATE = float(os.getenv("GROUP_RATE", 2))                    # 每秒補充的指令數
+GROUP_BURST = float(os.getenv("GROUP_BURST", 10))                 # 瞬間可連續處理的指令數
+GROUP_QUEUE_DEPTH = int(os.getenv("GROUP_QUEUE_DEPTH", 10))       # 每個群組最多排隊幾則
+WORKERS = int(os.getenv("ADMISSION_WORKERS", 8))                  # 同步版處理指令的 worker 執行緒數
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW_SECONDS", 2))  # 查詢結果共用的時間窗
+KILL_DEDUPE_SECONDS = float(os.getenv("KILL_DEDUPE_SECONDS", 10))
+
+_lock = threading.Lock()
+_groups = {}    # group_id -> _Group
+_flights = {}   # key -> _Flight
+_pool = None
+_async_tasks = set()
+_last_prune = 0.0
+
+
+class _Flight:
+    def __init__(self, version):
+        self.start_version = version
+        self.end_version = None
+        self.done = threading.Event()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.reusable = False
+
+
+class _Group:
+    def __init__(self, now):
+        self.tokens = GROUP_BURST
+        self.last = now
+        self.pending = deque()
+        self.running = False   # 已有 worker（或等待中的計時器）在處理這個群組的隊伍
+
+
+def _offer(group_id, task):
+    """
+    把指令放進群組隊伍；回傳 (是否接受, 是否需要啟動 drain)。
+    隊伍已有 GROUP_QUEUE_DEPTH 則在等待時直接丟棄。
+    """
+    with _lock:
+        group = _groups.get(group_id)
+        if group is None:
+            group = _groups[group_id] = _Group(time.monotonic())
+        if len(group.pending) >= GROUP_QUEUE_DEPTH:
+            return False, False
+        group.pending.append(task)
+        start = not group.running
+        group.running = True
+        return True, start
+
+
+def _next(group_id):
+    # 回傳 (task, 0)；名額不足時回傳 (None, 要等幾秒)；隊伍空了回傳 (None, None) 並結束 drain
+    with _lock:
+        group = _groups[group_id]
+        if not group.pending:
+            group.running = False
+            return None, None
+        now = time.monotonic()
+        group.tokens = min(GROUP_BURST, group.tokens + (now - group.last) * GROUP_RATE)
+        group.last = now
+        if group.tokens < 1:
+            return None, (1 - group.tokens) / GROUP_RATE
+        group.tokens -= 1
+        return group.pending.popleft(), 0
+
+
+def submit(group_id, task):
+    """
+    同步版（Flask）：task 交給 worker 執行緒，webhook 執行緒立即返回。
+    同一群組的指令依序執行，超過速率的等名額時不佔用任何執行緒；回傳 False 表示已丟棄。
+    """
+    accepted, start = _offer(group_id, task)
+    if start:
+        _executor().submit(_drain, group_id)
+    return accepted
+
+
+def _drain(group_id):
+    while True:
+        task, delay = _next(group_id)
+        if task is None:
+            if delay is not None:
+                timer = threading.Timer(delay, lambda: _executor().submit(_drain, group_id))
+                timer.daemon = True
+                timer.start()
+            return
+        try:
+            task()
+        except Exception as e:
+            print(f"❌ 群組 {group_id} 指令處理失敗：", e)
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="admission")
+    return _pool
+
+
+def submit_async(group_id, coro_fn):
+    # 非同步版（ASGI）：coro_fn() 回傳 coroutine；行為與 submit 相同，drain 是事件迴圈上的 task
+    # （asyncio 只在 ASGI 模式載入，同步版 import 時不付這個成本）
+    import asyncio
+
+    accepted, start = _offer(group_id, coro_fn)
+    if start:
+        task = asyncio.create_task(_drain_async(group_id))
+        _async_tasks.add(task)
+        task.add_done_callback(_async_tasks.discard)
+    return accepted
+
+
+async def _drain_async(group_id):
+    import asyncio
+
+    while True:
+        coro_fn, delay = _next(group_id)
+        if coro_fn is None:
+            if delay is None:
+                return
+            await asyncio.sleep(delay)
+            continue
+        try:
+            await coro_fn()
+        except Exception as e:
+            print(f"❌ 群組 {group_id} 指令處理失敗：", e)
+
+
+async def drain_all():
+    # ASGI 關閉時等待處理中的指令
+    if _async_tasks:
+        import asyncio
+        await asyncio.gather(*_async_tasks, return_exceptions=True)
+
+
+def coalesce_read(group_id, command, compute):
+    # 同一群組資料版本沒變時，COALESCE_WINDOW 內相同的查詢共用同一次計算結果
+    if command == "alias list":
+        # 別名卡片還取決於別名表與本群用過的 BOSS 集合
+        def version_of():
+            return (state.group_version(group_id), state.group_usage_version(group_id), state.alias_version())
+    else:
+        def version_of():
+            return state.group_version(group_id)
+    return _coalesce(("read", group_id, command), compute, COALESCE_WINDOW, version_of)
+
+
+def dedupe_kill(group_id, kill, compute):
+    """
+    相同關鍵字、相同指定時間（或同為「現在」）的擊殺，KILL_DEDUPE_SECONDS 內只處理一次。
+    compute 回傳 store.record_kill 的結果；只有真的寫入的結果會被後續重複回報共用，
+    找不到關鍵字（None）不保留（之後 add 了別名再打一次要能寫入）。
+    """
+    key = ("kill", group_id, kill.keyword, kill.kill_time if kill.explicit else None, state.alias_version())
+
+    def version_of():
+        # 不用群組版本號：同群組其他寫入（別的 BOSS 擊殺、kb all 回寫）很常見，不應讓重複回報再寫一次
+        return (state.group_epoch(group_id), state.alias_version())
+
+    return _coalesce(key, compute, KILL_DEDUPE_SECONDS, version_of, keep=lambda result: result is not None)
+
+
+def _coalesce(key, compute, window, version_of, keep=None):
+    # keep(result) 為 False 的結果只回給同時在等的請求，不保留給之後的請求
+    now = time.monotonic()
+    version = version_of()
+    with _lock:
+        flight = _flights.get(key)
+        if flight is not None and _joinable(flight, version, window, now):
+            leader = False
+        else:
+            flight = _flights[key] = _Flight(version)
+            leader = True
+            _prune(now)
+
+    if not leader:
+        flight.done.wait()
+    else:
+        try:
+            flight.result = compute()
+        except Exception as e:
+            flight.error = e
+        finally:
+            # 計算本身可能寫回資料庫（例如 kb all 回寫重生時間、擊殺）而更新版本號
+            flight.end_version = version_of()
+            flight.reusable = flight.error is None and (keep is None or keep(flight.result))
+            flight.finished_at = time.monotonic()
+            flight.done.set()
+
+    if flight.error is not None:
+        raise flight.error
+    return flight.result
+
+
+def _joinable(flight, version, window, now):
+    if not flight.done.is_set():
+        return flight.start_version == version
+    if not flight.reusable:
+        return False
+    return flight.end_version == version and now - flight.finished_at <= window
+
+
+def _prune(now):
+    # 呼叫端需持有 _lock；每秒最多清一次已經過期的結果，避免 _flights 無限長大
+    global _last_prune
+    if now - _last_prune < 1:
+        return
+    _last_prune = now
+    horizon = max(COALESCE_WINDOW, KILL_DEDUPE_SECONDS)
+    stale = [
+        k for k, f in _flights.items()
+        if f.done.is_set() and now - f.finished_at > horizon
+    ]
+    for k in stale:
+        del _flights[k]
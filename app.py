@@ -1,50 +1,76 @@
-from apscheduler.schedulers.background import BackgroundScheduler
 import os
-import json
-import psycopg2
-from flask import Flask, request, abort
+import time
+from flask import Blueprint, Flask, request
 from dotenv import load_dotenv
-from linebot import WebhookHandler
-from linebot.exceptions import InvalidSignatureError
-from linebot import WebhookHandler
-from linebot.models import (
-    MessageEvent,
-    FollowEvent,
-    UnfollowEvent
-)
-from linebot.models import TextMessage as V2TextMessage, TextSendMessage, FlexSendMessage
-from linebot.v3.messaging import MessagingApi, Configuration, ApiClient
-from linebot.v3.messaging.models import TextMessage as V3TextMessage, FlexMessage as V3FlexMessage
-from linebot.v3.messaging.models import PushMessageRequest
-from linebot.v3.messaging.models import ReplyMessageRequest
 from datetime import datetime, timedelta
 import pytz
+from commands import TZ
+import state
+import admission
+import dispatch
+import reminder
+import profiler
+import retention
+import boss_usage
+import seed
+from db import get_db_connection, get_read_connection
+
+# LINE SDK（尤其 linebot.v3.messaging）、排程器、Flex 模板 import 成本高，
+# 一律在第一次使用時才載入，讓冷啟動後 /ping 能盡快回應
 
 
 load_dotenv()
-app = Flask(__name__)
-# line_bot_api = LineBotApi(os.getenv("LINE_CHANNEL_ACCESS_TOKEN"))
-handler = WebhookHandler(os.getenv("LINE_CHANNEL_SECRET"))
-configuration = Configuration(access_token=os.getenv("LINE_CHANNEL_ACCESS_TOKEN"))
-api_client = ApiClient(configuration)
-messaging_api = MessagingApi(api_client)
-
-# messaging_api.push_message(
-#     to=group_id,
-#     messages=[TextMessage(text=msg)]
-# )
-
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        dbname=os.getenv("DB_NAME")
-    )
+bp = Blueprint("bot", __name__)
+_handler = None
+_messaging_api = None
+
+
+def create_app():
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+
+    from status_api import api_bp
+    app.register_blueprint(api_bp)
+
+    from profiler import profiler_bp
+    app.register_blueprint(profiler_bp)
+
+    # 啟動時先執行一次清理 + 匯入（SEED_ON_STARTUP=0 可略過）
+    if os.getenv("SEED_ON_STARTUP", "1") == "1":
+        seed.seed_on_startup()
+    return app
+
+
+def __getattr__(name):
+    # 相容 gunicorn app:app：第一次存取 app 時才建立
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_handler():
+    global _handler
+    if _handler is None:
+        from linebot import WebhookHandler
+        from linebot.models import MessageEvent, TextMessage as V2TextMessage
+        handler = WebhookHandler(os.getenv("LINE_CHANNEL_SECRET"))
+        handler.add(MessageEvent, message=V2TextMessage)(handle_message)
+        _handler = handler
+    return _handler
+
+
+def get_messaging_api():
+    global _messaging_api
+    if _messaging_api is None:
+        from linebot.v3.messaging import MessagingApi, Configuration, ApiClient
+        configuration = Configuration(access_token=os.getenv("LINE_CHANNEL_ACCESS_TOKEN"))
+        _messaging_api = MessagingApi(ApiClient(configuration))
+    return _messaging_api
+
 
 def get_respawn_hours_by_name(name):
-    conn = get_db_connection()
+    conn = get_read_connection(())
     cursor = conn.cursor()
     cursor.execute("SELECT respawn_hours FROM boss_list WHERE display_name = %s", (name,))
     result = cursor.fetchone()
@@ -52,623 +78,199 @@ def get_respawn_hours_by_name(name):
     conn.close()
     return result[0] if result else None
 
+class CommandStore:
+    """
+    dispatch.handle_command 的同步資料庫操作（psycopg2）；寫入一律走主庫，查詢可走唯讀副本。
+    版本號由 dispatch.apply_writes 更新，這裡不處理。
+    """
 
-# 自動清理重複 boss_aliases 並建立唯一索引
-def cleanup_boss_aliases():
-    try:
-        def cleanup_boss_aliases():
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                DELETE FROM boss_aliases a
-                USING boss_aliases b
-                WHERE a.id < b.id
-                  AND a.boss_id = b.boss_id
-                  AND a.keyword = b.keyword
-            """)
+    def record_kill(self, group_id, kill):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
             cursor.execute("""
-                DO $$
-                BEGIN
-                    IF NOT EXISTS (
-                        SELECT 1 FROM pg_indexes WHERE indexname = 'unique_boss_keyword'
-                    ) THEN
-                        CREATE UNIQUE INDEX unique_boss_keyword ON boss_aliases(boss_id, keyword);
-                    END IF;
-                END$$;
-            """)
+                SELECT b.id, b.display_name, b.respawn_hours
+                FROM boss_aliases a
+                JOIN boss_list b ON a.boss_id = b.id
+                WHERE a.keyword = %s
+            """, (kill.keyword,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+
+            boss_id, display_name, respawn_hours = row
+            respawn_time = kill.kill_time + timedelta(hours=respawn_hours)
+            # 同一群組同一 BOSS 的舊紀錄保留為歷史，只標記為 superseded（advisory lock 避免同時回報時出現兩筆目前紀錄）
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s), %s)", (group_id, boss_id))
+            cursor.execute(
+                "UPDATE boss_tasks SET superseded = TRUE WHERE group_id = %s AND boss_id = %s AND NOT superseded",
+                (group_id, boss_id)
+            )
+            cursor.execute(
+                "INSERT INTO boss_tasks (boss_id, group_id, kill_time, respawn_time) VALUES (%s, %s, %s, %s)",
+                (boss_id, group_id, kill.kill_time, respawn_time)
+            )
+            first_use = boss_usage.record(cursor, group_id, boss_id)
             conn.commit()
+            return display_name, respawn_time, first_use
+        finally:
             cursor.close()
             conn.close()
-            print("✅ 已清除重複 boss_aliases\n✅ 已建立唯一索引")
 
-    except Exception as e:
-        print("❌ 清理/索引建立失敗：", e)
+    def clear_group(self, group_id):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM boss_tasks WHERE group_id = %s", (group_id,))
+        cursor.execute(boss_usage.CLEAR_SQL, (group_id,))
+        conn.commit()
+        cursor.close()
+        conn.close()
 
+    def board(self, group_id):
+        # kb all / 出：本群組各 BOSS 最新一筆紀錄的重生表
+        from flex_templates import build_board_bubble
 
-# 自動匯入 boss_list.json 資料
-def auto_insert_boss_list():
-    print("🚀 執行 BOSS 自動匯入")
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        conn = get_read_connection([group_id])
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT
+                b.display_name,
+                t.id,
+                t.kill_time,
+                t.respawn_time,
+                b.respawn_hours
+            FROM boss_list b
+            LEFT JOIN LATERAL (
+                SELECT id, kill_time, respawn_time
+                FROM boss_tasks
+                WHERE boss_id = b.id AND group_id = %s AND NOT superseded
+                ORDER BY kill_time DESC, id DESC
+                LIMIT 1
+            ) t ON true
+            ORDER BY 
+              CASE WHEN t.kill_time IS NULL THEN 1 ELSE 0 END,
+              b.respawn_hours                    -- ✅ 用這裡排序而非動態計算
+        """, (group_id,))
+        results = cursor.fetchall()
+        cursor.close()
+        conn.close()
 
-    with open("boss_list.json", "r", encoding="utf-8") as f:
-        bosses = json.load(f)
+        bubble, updates = build_board_bubble(results, datetime.now(TZ))
 
-    # 清空舊有資料
-    cursor.execute("DELETE FROM boss_aliases")
-    print("✅ 已清除 boss_aliases 資料")
+        # ✅ 即時更新資料庫（已過期的重生時間往後推算）；讀取可能來自副本，回寫一律走主庫
+        if updates:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.executemany("""
+                UPDATE boss_tasks
+                SET respawn_time = %s
+                WHERE id = %s
+            """, [(respawn_time, task_id) for task_id, respawn_time in updates])
+            conn.commit()
+            cursor.close()
+            conn.close()
+        return bubble, bool(updates)
 
-    for boss in bosses:
-        display_name = boss["display_name"]
-        respawn_hours = boss["respawn_hours"]
-        keywords = boss["keywords"]
+    def delete_alias(self, group_id, keyword):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM boss_aliases WHERE keyword = %s", (keyword,))
+        conn.commit()
+        cursor.close()
+        conn.close()
 
-        # 新增 boss 主資料
+    def alias_target(self, group_id, keyword):
+        conn = get_read_connection([group_id])
+        cursor = conn.cursor()
         cursor.execute("""
-            INSERT INTO boss_list (display_name, respawn_hours)
-            VALUES (%s, %s)
-            ON CONFLICT (display_name)
-            DO UPDATE SET respawn_hours = EXCLUDED.respawn_hours
-            RETURNING id
-        """, (display_name, respawn_hours))
-        boss_id = cursor.fetchone()[0]
-
-        # 新增對應 keyword
-        for keyword in keywords:
-            cursor.execute("""
-                INSERT INTO boss_aliases (boss_id, keyword)
-                VALUES (%s, %s)
-                ON CONFLICT DO NOTHING
-            """, (boss_id, keyword.lower()))
+            SELECT b.display_name FROM boss_aliases a
+            JOIN boss_list b ON a.boss_id = b.id
+            WHERE a.keyword = %s
+        """, (keyword,))
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return row[0] if row else None
 
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print("✅ BOSS 資料匯入完成")
+    def alias_card(self, group_id):
+        # alias list：只列出本群用過的 BOSS 的別名（group_boss_usage + 快取的卡片）
+        return boss_usage.alias_card(group_id, lambda: get_read_connection([group_id]))
 
+    def add_alias(self, group_id, keyword, target_name):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM boss_list WHERE display_name = %s", (target_name,))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute(
+                "INSERT INTO boss_aliases (boss_id, keyword) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                (row[0], keyword)
+            )
+            conn.commit()
+        cursor.close()
+        conn.close()
+        return row is not None
 
 
-# 啟動時先執行一次清理 + 匯入
-cleanup_boss_aliases()
-auto_insert_boss_list()
+command_store = CommandStore()
 
 
-@app.route("/", methods=["GET"])
+@bp.route("/", methods=["GET"])
 def home():
     return "✅ Lineage2M BOSS Reminder Bot is running."
 
 
 # ✅ 新增 /ping route（避免平台睡眠）
-@app.route("/ping", methods=["GET"])
+@bp.route("/ping", methods=["GET"])
 def ping():
     tz = pytz.timezone("Asia/Taipei")
     now = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S")
     return f"pong - {now}", 200
 
 
-@app.route("/callback", methods=['POST'])
+@bp.route("/callback", methods=['POST'])
 def callback():
     signature = request.headers['X-Line-Signature']
     body = request.get_data(as_text=True)
     try:
-        handler.handle(body, signature)
+        with profiler.track("callback"), profiler.profile_if_slow("callback"):
+            get_handler().handle(body, signature)
     except Exception as e:
         print("Error:", e)
     return "OK", 200  # ✅ 立即給 LINE 回應
 
 
-@handler.add(MessageEvent, message=V2TextMessage)
 def handle_message(event):
     text = event.message.text.strip()
-    # group_id = event.source.group_id if event.source.type == "group" else "single"
     group_id = get_group_id(event)
-    if not group_id or not group_id.startswith("C"):
-        reply_text(event, "⚠️ 此功能僅限群組使用")
+    if not dispatch.is_group(group_id):
+        reply_text(event, dispatch.NOT_GROUP_MSG)
         return
 
-    # 處理 K 克4 170124（當日指定時間）
-    if text.lower().startswith("k "):
-        parts = text.split()
-        if len(parts) == 3 and parts[2].isdigit() and len(parts[2]) == 6:
-            _, keyword, timestr = parts
-            try:
-                hour = int(timestr[0:2])
-                minute = int(timestr[2:4])
-                second = int(timestr[4:6])
-                tz = pytz.timezone("Asia/Taipei")
-                kill_time = datetime.now(tz).replace(hour=hour, minute=minute, second=second, microsecond=0)
-
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                keyword = keyword.lower()
-                cursor.execute("""
-                    SELECT b.id, b.display_name, b.respawn_hours
-                    FROM boss_aliases a
-                    JOIN boss_list b ON a.boss_id = b.id
-                    WHERE a.keyword = %s
-                """, (keyword,))
-                row = cursor.fetchone()
-                if row:
-                    boss_id, display_name, respawn_hours = row
-                    respawn_time = kill_time + timedelta(hours=respawn_hours)
-                    # 先刪除同一群組同一 BOSS 的舊資料
-                    cursor.execute("DELETE FROM boss_tasks WHERE boss_id = %s AND group_id = %s", (boss_id, group_id))
-                    cursor.execute(
-                        "INSERT INTO boss_tasks (boss_id, group_id, kill_time, respawn_time) VALUES (%s, %s, %s, %s)",
-                        (boss_id, group_id, kill_time, respawn_time)
-                    )
-                    conn.commit()
-                    msg = f"\n\n🔴 擊殺：{display_name}\n🕓 死亡：{kill_time.strftime('%Y-%m-%d %H:%M:%S')}\n🟢 重生：{respawn_time.strftime('%Y-%m-%d %H:%M:%S')}"
-                else:
-                    msg = "❌ 找不到該 BOSS 關鍵字。"
-                cursor.close()
-                conn.close()
-            except:
-                msg = "❌ 時間格式錯誤，請使用 K 克4 170124 的格式。"
-            reply_text(event, msg)
-            return
-
-    # 處理 clear all 指令：清除該群組所有 BOSS 紀錄
-    if text.lower().strip() == "clear all":
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM boss_tasks WHERE group_id = %s", (group_id,))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        reply_text(event, "✅ 已清除本群組所有 BOSS 紀錄")
-        return
+    # 交給群組隊伍處理，webhook 立即回 200；隊伍已滿就丟棄，避免單一群組拖垮其他群組
+    if not admission.submit(group_id, lambda: run_command(event, group_id, text)):
+        print(f"⚠️ 群組 {group_id} 指令過多，已略過：{text}")
 
-    # 處理 kr1、kr2 克4 170124 格式，指定前日或前兩日死亡時間
-    if text.lower().startswith("kr1 ") or text.lower().startswith("kr2 "):
-        parts = text.split()
-        if len(parts) == 3:
-            prefix, keyword, timestr = parts
-            try:
-                hour = int(timestr[0:2])
-                minute = int(timestr[2:4])
-                second = int(timestr[4:6])
-                offset_days = 1 if prefix.lower() == "kr1" else 2
-                kill_time = datetime.now(pytz.timezone("Asia/Taipei")) - timedelta(days=offset_days)
-                kill_time = kill_time.replace(hour=hour, minute=minute, second=second, microsecond=0)
-
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                keyword = keyword.lower()
-                cursor.execute("""
-                    SELECT b.id, b.display_name, b.respawn_hours
-                    FROM boss_aliases a
-                    JOIN boss_list b ON a.boss_id = b.id
-                    WHERE a.keyword = %s
-                """, (keyword,))
-                row = cursor.fetchone()
-                if row:
-                    boss_id, display_name, respawn_hours = row
-                    respawn_time = kill_time + timedelta(hours=respawn_hours)
-                    # 先刪除同一群組同一 BOSS 的舊資料
-                    cursor.execute("DELETE FROM boss_tasks WHERE boss_id = %s AND group_id = %s", (boss_id, group_id))
-                    cursor.execute(
-                        "INSERT INTO boss_tasks (boss_id, group_id, kill_time, respawn_time) VALUES (%s, %s, %s, %s)",
-                        (boss_id, group_id, kill_time, respawn_time)
-                    )
-                    conn.commit()
-                    msg = f"\n\n🔴 擊殺：{display_name}\n🕓 死亡：{kill_time.strftime('%Y-%m-%d %H:%M:%S')}\n🟢 重生：{respawn_time.strftime('%Y-%m-%d %H:%M:%S')}"
-                else:
-                    msg = "❌ 找不到該 BOSS 關鍵字。"
-                cursor.close()
-                conn.close()
-            except:
-                msg = "❌ 時間格式錯誤，請使用 kr1 克4 170124 的格式。"
-        else:
-            msg = "❌ 指令格式錯誤，請使用 kr1 克4 170124 的格式。"
-        reply_text(event, msg)
-        return
-    # 處理 K、k 指令作為擊殺紀錄
-    if text.lower().startswith("k "):
-        keyword = text[2:].strip()
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        keyword = keyword.lower()
-        cursor.execute("""
-            SELECT b.id, b.display_name, b.respawn_hours
-            FROM boss_aliases a
-            JOIN boss_list b ON a.boss_id = b.id
-            WHERE a.keyword = %s
-        """, (keyword,))
-        row = cursor.fetchone()
-        if row:
-            boss_id, display_name, respawn_hours = row
-            now = datetime.now(pytz.timezone('Asia/Taipei'))
-            respawn_time = now + timedelta(hours=respawn_hours)
-            # 先刪除同一群組同一 BOSS 的舊資料
-            cursor.execute("DELETE FROM boss_tasks WHERE boss_id = %s AND group_id = %s", (boss_id, group_id))
 
-            # 插入新紀錄
-            cursor.execute(
-                "INSERT INTO boss_tasks (boss_id, group_id, kill_time, respawn_time) VALUES (%s, %s, %s, %s)",
-                (boss_id, group_id, now, respawn_time)
-            )
-            conn.commit()
-
-            msg = f"\n\n🔴 擊殺：{display_name}\n🕓 死亡：{now.strftime('%Y-%m-%d %H:%M:%S')}\n🟢 重生：{respawn_time.strftime('%Y-%m-%d %H:%M:%S')}"
+def run_command(event, group_id, text):
+    with profiler.track("command"), profiler.profile_if_slow("command"):
+        reply = dispatch.run(group_id, text, command_store, wrap=_share_results)
+        if reply.push:
+            send_text(group_id, reply.text)
         else:
-            msg = "❌ 無法辨識的關鍵字，請先使用 add 指令新增。"
-        cursor.close()
-        conn.close()
-        reply_text(event, msg)
-        return
+            reply_text(event, reply.text, contents=reply.contents)
 
-    text = event.message.text.strip().lower()
-    group_id = event.source.group_id if event.source.type == "group" else "single"
-    if text in ["kb all", "出"]:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT
-                b.display_name,
-                t.group_id,
-                t.kill_time,
-                t.respawn_time,
-                b.respawn_hours
-            FROM boss_list b
-            LEFT JOIN LATERAL (
-                SELECT group_id, kill_time, respawn_time   -- ✅ 這裡也要補上
-                FROM boss_tasks
-                WHERE boss_id = b.id AND group_id = %s
-                ORDER BY kill_time DESC, id DESC
-                LIMIT 1
-            ) t ON true
-            ORDER BY 
-              CASE WHEN t.kill_time IS NULL THEN 1 ELSE 0 END,
-              b.respawn_hours                    -- ✅ 用這裡排序而非動態計算
-        """, (group_id,))
 
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+def _share_results(group_id, op, call):
+    # 重複回報的擊殺只寫一次；同時間相同的查詢共用一次結果（見 admission.py）
+    if op[0] == "record_kill":
+        return admission.dedupe_kill(group_id, op[1], call)
+    if op[0] == "board":
+        return admission.coalesce_read(group_id, "board", call)
+    if op[0] == "alias_card":
+        return admission.coalesce_read(group_id, "alias list", call)
+    return call()
 
-        tz = pytz.timezone('Asia/Taipei')
-        now = datetime.now(tz)
-        soon = now + timedelta(minutes=30)
-        next_24hr = now + timedelta(hours=24)
-
-        lines = ["🕓 即將重生 BOSS：\n"]
-
-        yellow_list = [
-            "被汙染的克魯瑪", "司穆艾爾", "提米特利斯", "突變克魯瑪", "黑色蕾爾莉",
-            "寇倫", "提米妮爾", "卡坦", "蘭多勒", "貝希莫斯", "薩班", "史坦",
-            "忘卻之鏡", "大地祭壇", "水之祭壇", "風之祭壇", "黑闇祭壇", "克拉奇",
-            "梅杜莎", "沙勒卡", "塔拉金"
-        ]
-
-        purple_list = [
-            "黑卡頓", "塔那透斯", "巴倫", "摩德烏斯", "歐克斯", "薩拉克斯", "哈普", "霸拉克",
-            "安德拉斯", "納伊阿斯", "核心基座", "巨蟻女王", "卡布里歐", "鳳凰", "猛龍獸",
-            "奧爾芬", "弗林特", "拉何"
-        ]
-
-        def next_respawn_time(r):
-            if r[2]:  # r[2] 是 kill_time
-                try:
-                    respawn_hours  = r[4]
-                    if not isinstance(respawn_hours , (int, float)):
-                        print(f"❌ 錯誤：hours 型別錯誤：{type(respawn_hours )}，值：{respawn_hours }")
-                        return float('inf')
-                    respawn_time = r[2].astimezone(tz) + timedelta(hours=respawn_hours)
-                    while respawn_time < now:
-                        respawn_time += timedelta(hours=respawn_hours)
-                    delta = (respawn_time - now).total_seconds()
-                    return delta
-                except Exception as e:
-                    print(f"❌ next_respawn_time 錯誤：{e}")
-                    return float('inf')
-            else:
-                return float('inf')
-
-        # ✅ 按照最近即將重生的排最前
-        sorted_results = sorted(results, key=next_respawn_time)
-
-        flex_contents = []
-
-        for name, task_id, kill_time, respawn_time, respawn_hours in results:
-            # hours 應該是 int
-            if not isinstance(respawn_hours, (int, float)):
-                print("❌ hours 傳錯型別！內容：", respawn_hours, type(respawn_hours))
-                continue  # 跳過，避免崩潰
-
-            box = {
-                "type": "box",
-                "layout": "vertical",
-                "paddingAll": "md",
-                "margin": "sm",
-                "contents": [],
-            }
-
-            # 判斷有無紀錄
-            if kill_time:
-                respawn_time = kill_time.astimezone(tz) + timedelta(hours=respawn_hours)
-                if now < respawn_time <= soon:
-                    color = "#D60000"
-                    note = "（快重生）"
-                    emoji = "🔥 "
-                    weight = "bold"
-                    text_block = {
-                        "type": "text",
-                        "text": f"{emoji}{respawn_time.strftime('%H:%M:%S')} {name}{note}",
-                        "color": color,
-                        "weight": weight,
-                        "size": "sm",
-                        "wrap": True
-                    }
-                    box = {
-                        "type": "box",
-                        "layout": "vertical",
-                        "contents": [text_block]
-                    }
-                    if name in yellow_list:
-                        box["backgroundColor"] = "#FFF9DC"  # 淡鵝黃色
-                    elif name in purple_list:
-                        box["backgroundColor"] = "#F5F0FF"  # 淡粉紫色
-                    flex_contents.append(box)
-                elif now > respawn_time:
-                    diff = (now - respawn_time).total_seconds()
-                    passed = int(diff // (respawn_hours * 3600))
-                    if passed >= 1:
-                        respawn_time += timedelta(hours=passed * respawn_hours)
-                        # ✅ 即時更新資料庫
-                        update_conn = get_db_connection()
-                        update_cursor = update_conn.cursor()
-                        update_cursor.execute("""
-                                UPDATE boss_tasks
-                                SET respawn_time = %s
-                                WHERE id = %s
-                            """, (respawn_time, task_id))
-                        update_conn.commit()
-                        update_cursor.close()
-                        update_conn.close()
-                    note = f"（過{passed}）" if passed >= 1 else ""
-
-                    color = "#999999"
-                    emoji = ""
-                    weight = "regular"
-                    text_block = {
-                        "type": "text",
-                        "text": f"{emoji}{respawn_time.strftime('%H:%M:%S')} {name}{note}",
-                        "color": color,
-                        "weight": weight,
-                        "size": "sm",
-                        "wrap": True
-                    }
-                    box = {
-                        "type": "box",
-                        "layout": "vertical",
-                        "contents": [text_block]
-                    }
-                    if name in yellow_list:
-                        box["backgroundColor"] = "#FFF9DC"  # 淡鵝黃色
-                    elif name in purple_list:
-                        box["backgroundColor"] = "#F5F0FF"  # 淡粉紫色
-                    flex_contents.append(box)
-                else:
-                    color = "#000000"
-                    note = ""
-                    emoji = ""
-                    weight = "regular"
-                    text_block = {
-                        "type": "text",
-                        "text": f"{emoji}{respawn_time.strftime('%H:%M:%S')} {name}{note}",
-                        "color": color,
-                        "weight": weight,
-                        "size": "sm",
-                        "wrap": True
-                    }
-                    box = {
-                        "type": "box",
-                        "layout": "vertical",
-                        "contents": [text_block]
-                    }
-                    if name in yellow_list:
-                        box["backgroundColor"] = "#FFF9DC"  # 淡鵝黃色
-                    elif name in purple_list:
-                        box["backgroundColor"] = "#F5F0FF"  # 淡粉紫色
-                    flex_contents.append(box)
-                time_str = respawn_time.strftime("%H:%M:%S")
-            else:
-                text_block = {
-                    "type": "text",
-                    "text": f"__:__:__ {name}",
-                    "color": "#CCCCCC",
-                    "size": "sm",
-                    "wrap": True
-                }
-                box = {
-                    "type": "box",
-                    "layout": "vertical",
-                    "contents": [text_block]
-                }
-                flex_contents.append(box)
-
-        bubble = {
-            "type": "bubble",
-            "body": {
-                "type": "box",
-                "layout": "vertical",
-                "paddingAll": "md",
-                "contents": [
-                    {
-                        "type": "text",
-                        "text": "🕓 即將重生 BOSS",
-                        "weight": "bold",
-                        "size": "md",
-                        "margin": "md"
-                    },
-                    {
-                        "type": "separator",
-                        "margin": "md"
-                    },
-                    *flex_contents
-                ]
-            }
-        }
-        for name, task_id, kill_time, respawn_hours in results:
-            if kill_time:
-                respawn_time = kill_time.replace(tzinfo=pytz.timezone('Asia/Taipei')) + timedelta(hours=respawn_hours)
-                if now <= respawn_time <= next_24hr:
-                    lines.append(f"{respawn_time.strftime('%H:%M:%S')} {name}\n")
-                elif now > respawn_time:
-                    if respawn_hours:
-                        diff = (now - respawn_time).total_seconds()
-                        passed_cycles = int(diff // (respawn_hours * 3600))  # 向下取整，避免誤差提前進位
-                        if passed_cycles >= 1:
-                            respawn_time += timedelta(hours=passed_cycles * respawn_hours)
-                            print(f"[DEBUG] respawn_hours 的類型是：{type(respawn_hours)}")
-                            # 更新資料庫
-                            update_conn = get_db_connection()
-                            update_cursor = update_conn.cursor()
-                            update_cursor.execute("""
-                                UPDATE boss_tasks
-                                SET respawn_time = %s
-                                WHERE id = %s
-                            """, (respawn_time, task_id))
-                            update_conn.commit()
-                            update_cursor.close()
-                            update_conn.close()
-                        note = f"（過{passed_cycles}）" if passed_cycles >= 1 else ""
-                        lines.append(f"{respawn_time.strftime('%H:%M:%S')} {name}{note}\n")
-                    else:
-                        lines.append(f"{respawn_time.strftime('%H:%M:%S')} {name}\n")
-                else:
-                    lines.append(f"{respawn_time.strftime('%H:%M:%S')} {name}\n")
-            else:
-                lines.append(f"__:__:__ {name}\n")
-
-        respawn_summary = ''.join(lines)
-        reply_text(event, "🕓 即將重生 BOSS", contents=bubble)
-
-    # ✅ ALIAS 指令管理區段
-    if text.startswith("alias ") or text.startswith("add "):
-        parts = text.split()
-        if len(parts) < 2:
-            reply_text(event, "⚠️ 格式錯誤，請使用：alias 別名 正式名稱")
-            return
-
-        subcommand = parts[1].lower()
-
-        # alias del keyword
-        if subcommand == "del" and len(parts) == 3:
-            keyword = parts[2].lower()
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM boss_aliases WHERE keyword = %s", (keyword,))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            reply_text(event, f"🗑️ 已刪除別名「{keyword}」")
-
-            return
-
-        # alias check keyword
-        if subcommand == "check" and len(parts) == 3:
-            keyword = parts[2].lower()
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT b.display_name FROM boss_aliases a
-                JOIN boss_list b ON a.boss_id = b.id
-                WHERE a.keyword = %s
-            """, (keyword,))
-            row = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            if row:
-                reply_text(event, f"🔍 「{keyword}」 對應 BOSS：{row[0]}")
-            else:
-                reply_text(event, f"❌ 找不到「{keyword}」的對應 BOSS")
-            return
-
-        # ✅ alias list（只顯示本群使用過的 BOSS）
-        if subcommand == "list":
-            group_id = get_group_id(event)
-            if not group_id or not group_id.startswith("C"):  # 判斷是否為合法群組
-                reply_text(event, "⚠️ 此功能僅限群組使用")
-                return
-
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT DISTINCT a.keyword, b.display_name
-                FROM boss_aliases a
-                JOIN boss_list b ON a.boss_id = b.id
-                JOIN boss_tasks t ON b.id = t.boss_id
-                WHERE t.group_id = %s
-                ORDER BY b.display_name
-            """, (group_id,))
-            rows = cursor.fetchall()
-            cursor.close()
-            conn.close()
-
-            if not rows:
-                reply_text(event, "📭 本群組尚未使用過任何別名。")
-
-                return
-
-            # 建立 Flex Message 卡片內容
-            alias_contents = [
-                {
-                    "type": "box",
-                    "layout": "horizontal",
-                    "contents": [
-                        {"type": "text", "text": k, "size": "sm", "flex": 2, "weight": "bold"},
-                        {"type": "text", "text": "→", "size": "sm", "flex": 1},
-                        {"type": "text", "text": n, "size": "sm", "flex": 5}
-                    ]
-                } for k, n in rows
-            ]
-
-            bubble = {
-                "type": "bubble",
-                "body": {
-                    "type": "box",
-                    "layout": "vertical",
-                    "contents": [
-                        {"type": "text", "text": "📘 本群組別名清單", "weight": "bold", "size": "md", "margin": "md"},
-                        {"type": "separator", "margin": "md"},
-                        *alias_contents
-                    ]
-                }
-            }
-            reply_text(event, "本群別名清單", contents=bubble)
-            return
-
-        # alias 新增 keyword → display_name
-        if len(parts) >= 3:
-            keyword = parts[1].lower()
-            target_name = parts[2]
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM boss_list WHERE display_name = %s", (target_name,))
-            row = cursor.fetchone()
-            if row:
-                boss_id = row[0]
-                cursor.execute(
-                    "INSERT INTO boss_aliases (boss_id, keyword) VALUES (%s, %s) ON CONFLICT DO NOTHING",
-                    (boss_id, keyword)
-                )
-                conn.commit()
-                msg = f"✅ 已將「{keyword}」設定為「{target_name}」的別名！"
-            else:
-                msg = f"❌ 找不到名稱為「{target_name}」的 BOSS。"
-            cursor.close()
-            conn.close()
-            reply_text(event, msg)
-            return
-
-    messaging_api.push_message(
-        push_message_request=PushMessageRequest(
-            to=group_id,
-            messages=[V3TextMessage(text="你輸入了 ..." + text)]
-        )
-    )
 
 def get_group_id(event):
     if hasattr(event.source, "group_id"):
@@ -680,12 +282,15 @@ def get_group_id(event):
 
 
 def reply_text(event, text, contents=None):
+    from linebot.v3.messaging.models import TextMessage as V3TextMessage, FlexMessage as V3FlexMessage
+    from linebot.v3.messaging.models import FlexContainer, ReplyMessageRequest
+
     if contents:
-        message = V3FlexMessage(alt_text=text, contents=contents)
+        message = V3FlexMessage(alt_text=text, contents=FlexContainer.from_dict(contents))
     else:
         message = V3TextMessage(text=text)
 
-    messaging_api.reply_message(
+    get_messaging_api().reply_message(
         ReplyMessageRequest(
             reply_token=event.reply_token,
             messages=[message]
@@ -694,8 +299,10 @@ def reply_text(event, text, contents=None):
 
 
 
-def send_text(group_id, msg):
-    messaging_api.push_message(
+def send_text(group_id, msg, messaging_api=None):
+    from linebot.v3.messaging.models import TextMessage as V3TextMessage, PushMessageRequest
+
+    (messaging_api or get_messaging_api()).push_message(
         push_message_request=PushMessageRequest(
             to=group_id,
             messages=[V3TextMessage(text=msg)]
@@ -704,113 +311,37 @@ def send_text(group_id, msg):
 
 
 # ✅ 自動推播 BOSS 重生提醒（兩分鐘內 + 過期持續提醒 + 正確時間更新）
-def reminder_job():
+# clock / store / messaging_api 可替換，供 benchmarks/reminder_sim.py 以假時鐘、記憶體資料庫模擬
+def reminder_job(clock=None, store=None, messaging_api=None):
+    now = clock() if clock else datetime.now(TZ)
+    started = time.perf_counter()
+    pushes = 0
+    error = None
+    owns_store = store is None
     try:
-        tz = pytz.timezone("Asia/Taipei")
-        now = datetime.now(tz)
-        soon = now + timedelta(minutes=2)
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # 查詢所有 boss 的最新資訊（含週期）
-        cursor.execute("""
-            SELECT
-                b.display_name,
-                t.group_id,
-                t.kill_time,
-                t.respawn_time,
-                b.respawn_hours  -- ✅ 一定要加這行
-            FROM boss_list b
-            LEFT JOIN LATERAL (
-                SELECT group_id, kill_time, respawn_time
-                FROM boss_tasks
-                WHERE boss_id = b.id
-                ORDER BY kill_time DESC, id DESC
-                LIMIT 1
-            ) t ON true
-        """)
-        results = cursor.fetchall()
-
-        for name, group_id, kill_time, respawn_time, respawn_hours in results:
-            if not group_id or not group_id.startswith("C"):
-                continue
-
-            if respawn_time is None:
-                continue  # 或設為 now 也可：respawn_time = now
-            # 確保 respawn_time 是 timezone-aware
-            if respawn_time.tzinfo is None:
-                respawn_time = tz.localize(respawn_time)
-
-            # 計算實際下一次應重生的時間（若已過期則加上週期直到未來）
-            next_respawn = respawn_time
-
-            passed = 0
-            while next_respawn < now:
-                next_respawn += timedelta(hours=respawn_hours)
-                passed += 1
-
-            # ✅ 寫回資料庫，更新為最新的下一次時間點
-            if passed > 0:
-                cursor.execute("""
-                    UPDATE boss_tasks
-                    SET respawn_time = %s
-                    WHERE boss_id = (
-                        SELECT id FROM boss_list WHERE display_name = %s LIMIT 1
-                    ) AND group_id = %s
-                """, (next_respawn, name, group_id))
-                conn.commit()
-            if 0 <= (next_respawn - now).total_seconds() <= 120:
-                try:
-                    suffix = f"（過{passed}）" if passed > 0 else ""
-                    msg = f"*{name}* 即將出現{suffix}"
-                    messaging_api.push_message(
-                        push_message_request=PushMessageRequest(
-                            to=group_id,
-                            messages=[V3TextMessage(text=msg)]
-                        )
-                    )
-                except Exception as e:
-                    print(f"❌ 提醒失敗：{e}")
-
-        cursor.close()
-        conn.close()
+        with profiler.track("reminder_job"):
+            if owns_store:
+                store = reminder.PostgresTaskStore(get_db_connection, lambda: get_read_connection(()))
+            try:
+                pushes = reminder.run_reminders(
+                    store, now, lambda group_id, msg: send_text(group_id, msg, messaging_api)
+                )
+            finally:
+                if owns_store:
+                    store.close()
     except Exception as e:
+        error = str(e)
         print("❌ 排程提醒錯誤：", e)
-
-
-@app.route("/debug-respawn", methods=["GET"])
-def debug_respawn_route():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT 
-            b.display_name AS boss_name,
-            t.kill_time,
-            t.respawn_time,
-            b.respawn_hours,
-            EXTRACT(EPOCH FROM (t.respawn_time - t.kill_time)) / 3600 AS actual_hours,
-            (EXTRACT(EPOCH FROM (t.respawn_time - t.kill_time)) / 3600) - b.respawn_hours AS hour_difference
-        FROM boss_tasks t
-        JOIN boss_list b ON t.boss_id = b.id
-        ORDER BY t.respawn_time DESC
-        LIMIT 20
-    """)
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-
-    output = "<h2>重生時間誤差檢查</h2><ul>"
-    for row in rows:
-        boss, kill, respawn, expected, actual, diff = row
-        output += f"<li><b>{boss}</b>：預期 {expected} 小時，實際 {actual:.2f} 小時，誤差 {diff:.2f} 小時</li>"
-    output += "</ul>"
-    return output
+    state.record_reminder_run(now, (time.perf_counter() - started) * 1000, pushes, error)
 
 
 if __name__ == "__main__":
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    app = create_app()
     scheduler = BackgroundScheduler()
     scheduler.add_job(reminder_job, "interval", minutes=1)
+    scheduler.add_job(retention.compaction_job, "interval", hours=24, args=[get_db_connection])
     scheduler.start()
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
 
@@ -0,0 +1,344 @@
+# 非同步服務模式（ASGI）：uvicorn asgi_app:app
+# 指令判斷與回覆共用 dispatch.py，這裡只提供 asyncpg 版的資料庫操作（AsyncCommandStore）；
+# 擊殺去重／查詢共用（admission.dedupe_kill / coalesce_read）只在同步版套用
+# 可以開多個 worker：提醒／壓縮排程只在持有排程鎖（async_db.hold_scheduler_lock）的 worker 執行
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from linebot.v3 import WebhookParser
+from linebot.v3.exceptions import InvalidSignatureError
+from linebot.v3.webhooks import MessageEvent, TextMessageContent
+from linebot.v3.messaging import (
+    AsyncApiClient,
+    AsyncMessagingApi,
+    Configuration,
+    FlexContainer,
+    FlexMessage,
+    PushMessageRequest,
+    ReplyMessageRequest,
+    TextMessage,
+)
+
+import admission
+import async_db
+import boss_usage
+import dispatch
+import reminder
+import retention
+import seed
+import state
+from async_db import to_db_time
+from db import get_db_connection
+from commands import TZ
+from flex_templates import build_board_bubble
+
+
+load_dotenv()
+parser = WebhookParser(os.getenv("LINE_CHANNEL_SECRET"))
+configuration = Configuration(access_token=os.getenv("LINE_CHANNEL_ACCESS_TOKEN"))
+api_client = None
+messaging_api = None
+
+# 背景處理中的事件（保留參照，避免 task 被回收）
+_background_tasks = set()
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global api_client, messaging_api
+    # 與 app.create_app 相同：匯入 BOSS 資料、建立 boss_tasks 分割表與 group_boss_usage（用 psycopg2，在執行緒中跑）
+    if os.getenv("SEED_ON_STARTUP", "1") == "1":
+        await asyncio.to_thread(seed.seed_on_startup)
+    await async_db.init_pool()
+    api_client = AsyncApiClient(configuration)
+    messaging_api = AsyncMessagingApi(api_client)
+    reminder_task = asyncio.create_task(reminder_loop())
+    compaction_task = asyncio.create_task(compaction_loop())
+    try:
+        yield
+    finally:
+        reminder_task.cancel()
+        compaction_task.cancel()
+        if _background_tasks:
+            await asyncio.gather(*_background_tasks, return_exceptions=True)
+        await admission.drain_all()
+        await api_client.close()
+        await async_db.release_scheduler_lock()
+        await async_db.close_pool()
+
+
+async def home(request):
+    return PlainTextResponse("✅ Lineage2M BOSS Reminder Bot is running.")
+
+
+# ✅ /ping route（避免平台睡眠）
+async def ping(request):
+    now = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
+    return PlainTextResponse(f"pong - {now}")
+
+
+async def callback(request):
+    signature = request.headers.get("X-Line-Signature", "")
+    body = (await request.body()).decode("utf-8")
+    try:
+        events = parser.parse(body, signature)
+    except InvalidSignatureError as e:
+        print("Error:", e)
+        return PlainTextResponse("OK")
+
+    for event in events:
+        if isinstance(event, MessageEvent) and isinstance(event.message, TextMessageContent):
+            _spawn(_safe_handle(event))
+    return PlainTextResponse("OK")  # ✅ 立即給 LINE 回應
+
+
+async def _safe_handle(event):
+    try:
+        await handle_message(event)
+    except Exception as e:
+        print("Error:", e)
+
+
+def get_group_id(event):
+    if getattr(event.source, "group_id", None):
+        return event.source.group_id
+    elif getattr(event.source, "room_id", None):
+        return event.source.room_id
+    else:
+        return None
+
+
+async def reply_text(event, text, contents=None):
+    if contents:
+        message = FlexMessage(alt_text=text, contents=FlexContainer.from_dict(contents))
+    else:
+        message = TextMessage(text=text)
+
+    await messaging_api.reply_message(
+        ReplyMessageRequest(
+            reply_token=event.reply_token,
+            messages=[message]
+        )
+    )
+
+
+async def send_text(group_id, msg):
+    await messaging_api.push_message(
+        PushMessageRequest(
+            to=group_id,
+            messages=[TextMessage(text=msg)]
+        )
+    )
+
+
+class AsyncCommandStore:
+    # dispatch.handle_command 的非同步資料庫操作（asyncpg），與 app.CommandStore 一一對應
+
+    async def record_kill(self, group_id, kill):
+        pool = async_db.get_pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                SELECT b.id, b.display_name, b.respawn_hours
+                FROM boss_aliases a
+                JOIN boss_list b ON a.boss_id = b.id
+                WHERE a.keyword = $1
+            """, kill.keyword)
+            if not row:
+                return None
+
+            boss_id, display_name, respawn_hours = row
+            respawn_time = kill.kill_time + timedelta(hours=respawn_hours)
+            async with conn.transaction():
+                # 同一群組同一 BOSS 的舊紀錄保留為歷史，只標記為 superseded
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1), $2)", group_id, boss_id)
+                await conn.execute(
+                    "UPDATE boss_tasks SET superseded = TRUE WHERE group_id = $1 AND boss_id = $2 AND NOT superseded",
+                    group_id, boss_id
+                )
+                await conn.execute(
+                    "INSERT INTO boss_tasks (boss_id, group_id, kill_time, respawn_time) VALUES ($1, $2, $3, $4)",
+                    boss_id, group_id, to_db_time(kill.kill_time), to_db_time(respawn_time)
+                )
+                first_use = await conn.fetchval(
+                    "INSERT INTO group_boss_usage (group_id, boss_id) VALUES ($1, $2) ON CONFLICT DO NOTHING RETURNING true",
+                    group_id, boss_id
+                )
+        return display_name, respawn_time, bool(first_use)
+
+    async def clear_group(self, group_id):
+        pool = async_db.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("DELETE FROM boss_tasks WHERE group_id = $1", group_id)
+                await conn.execute(boss_usage.CLEAR_SQL.replace("%s", "$1"), group_id)
+
+    async def board(self, group_id):
+        pool = async_db.get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT
+                    b.display_name,
+                    t.id,
+                    t.kill_time,
+                    t.respawn_time,
+                    b.respawn_hours
+                FROM boss_list b
+                LEFT JOIN LATERAL (
+                    SELECT id, kill_time, respawn_time
+                    FROM boss_tasks
+                    WHERE boss_id = b.id AND group_id = $1 AND NOT superseded
+                    ORDER BY kill_time DESC, id DESC
+                    LIMIT 1
+                ) t ON true
+                ORDER BY
+                  CASE WHEN t.kill_time IS NULL THEN 1 ELSE 0 END,
+                  b.respawn_hours
+            """, group_id)
+
+            bubble, updates = build_board_bubble([tuple(r) for r in rows], datetime.now(TZ))
+            if updates:
+                await conn.executemany(
+                    "UPDATE boss_tasks SET respawn_time = $1 WHERE id = $2",
+                    [(to_db_time(respawn_time), task_id) for task_id, respawn_time in updates]
+                )
+        return bubble, bool(updates)
+
+    async def delete_alias(self, group_id, keyword):
+        await async_db.get_pool().execute("DELETE FROM boss_aliases WHERE keyword = $1", keyword)
+
+    async def alias_target(self, group_id, keyword):
+        return await async_db.get_pool().fetchval("""
+            SELECT b.display_name FROM boss_aliases a
+            JOIN boss_list b ON a.boss_id = b.id
+            WHERE a.keyword = $1
+        """, keyword)
+
+    async def alias_card(self, group_id):
+        # 與 boss_usage.alias_card 相同：快取命中時不查資料庫
+        versions, bubble = boss_usage.cached_card(group_id)
+        if bubble is not boss_usage.MISS:
+            return bubble
+        pool = async_db.get_pool()
+        async with pool.acquire() as conn:
+            alias_rows = None
+            if boss_usage.aliases_stale(versions):
+                alias_rows = await conn.fetch(boss_usage.ALIASES_SQL)
+            used = await conn.fetch(boss_usage.USED_SQL.replace("%s", "$1"), group_id)
+        return boss_usage.build_card(group_id, versions, [r[0] for r in used], alias_rows)
+
+    async def add_alias(self, group_id, keyword, target_name):
+        pool = async_db.get_pool()
+        boss_id = await pool.fetchval("SELECT id FROM boss_list WHERE display_name = $1", target_name)
+        if not boss_id:
+            return False
+        await pool.execute(
+            "INSERT INTO boss_aliases (boss_id, keyword) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+            boss_id, keyword
+        )
+        return True
+
+
+command_store = AsyncCommandStore()
+
+
+async def handle_message(event):
+    text = event.message.text.strip()
+    group_id = get_group_id(event)
+    if not dispatch.is_group(group_id):
+        await reply_text(event, dispatch.NOT_GROUP_MSG)
+        return
+
+    # 與同步版相同：排入群組隊伍，隊伍已滿就丟棄
+    if not admission.submit_async(group_id, lambda: run_command(event, group_id, text)):
+        print(f"⚠️ 群組 {group_id} 指令過多，已略過：{text}")
+
+
+async def run_command(event, group_id, text):
+    reply = await dispatch.run_async(group_id, text, command_store)
+    if reply.push:
+        await send_text(group_id, reply.text)
+    else:
+        await reply_text(event, reply.text, contents=reply.contents)
+
+
+# ✅ 自動推播 BOSS 重生提醒（與 app.reminder_job 相同邏輯，推播改為並行送出）
+async def reminder_job():
+    try:
+        now = datetime.now(TZ)
+        pool = async_db.get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                reminder.DUE_TASKS_SQL.replace("%s", "$1"),
+                to_db_time(now + timedelta(seconds=reminder.REMINDER_WINDOW_SECONDS))
+            )
+            updates, pushes = reminder.plan_reminders([tuple(r) for r in rows], now)
+
+            # ✅ 寫回資料庫，更新為最新的下一次時間點
+            if updates:
+                await conn.executemany(
+                    "UPDATE boss_tasks SET respawn_time = $1 WHERE id = $2",
+                    [(to_db_time(next_respawn), task_id) for task_id, _, next_respawn in updates]
+                )
+                # 與 reminder.PostgresTaskStore.update_respawn 相同：讓 /api 快取與查詢共用失效
+                for group_id in {group_id for _, group_id, _ in updates}:
+                    state.bump_group(group_id)
+
+        results = await asyncio.gather(
+            *(send_text(group_id, msg) for group_id, msg in pushes), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"❌ 提醒失敗：{result}")
+    except Exception as e:
+        print("❌ 排程提醒錯誤：", e)
+
+
+# 多個 worker（uvicorn --workers N）時只有持有排程鎖的 worker 會執行，其他 worker 每輪重試，
+# 持有鎖的 worker 結束或斷線後由其他 worker 接手
+async def _is_scheduler(name):
+    try:
+        return await async_db.hold_scheduler_lock()
+    except Exception as e:
+        print(f"❌ {name} 取得排程鎖失敗：", e)
+        return False
+
+
+async def reminder_loop():
+    while True:
+        if await _is_scheduler("reminder"):
+            await reminder_job()
+        await asyncio.sleep(60)
+
+
+# ✅ 每天建立未來的分割並清除過期歷史（與 app.py 排程的 retention.compaction_job 相同）
+# 不是排程 worker 時每分鐘重試，接手後才開始每天執行
+async def compaction_loop():
+    while True:
+        if await _is_scheduler("compaction"):
+            await asyncio.to_thread(retention.compaction_job, get_db_connection)
+            await asyncio.sleep(24 * 60 * 60)
+        else:
+            await asyncio.sleep(60)
+
+
+app = Starlette(
+    routes=[
+        Route("/", home, methods=["GET"]),
+        Route("/ping", ping, methods=["GET"]),
+        Route("/callback", callback, methods=["POST"]),
+    ],
+    lifespan=lifespan,
+)
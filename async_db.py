@@ -0,0 +1,88 @@
+# 非同步資料庫連線池（asyncpg），供 asgi_app.py 使用
+import asyncio
+import os
+import asyncpg
+from dotenv import load_dotenv
+
+from commands import TZ, TZ_NAME
+
+load_dotenv()
+
+_pool = None
+_scheduler_conn = None   # 持有排程 advisory lock 的連線（見 hold_scheduler_lock）
+_scheduler_guard = asyncio.Lock()
+
+
+def _connect_kwargs():
+    return dict(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT") or 5432),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+        # 與 db.CONNECT_OPTIONS 相同：session TimeZone 設為台北，now() 與時間換算和同步版一致
+        server_settings={"timezone": TZ_NAME},
+    )
+
+
+async def init_pool():
+    global _pool
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            min_size=int(os.getenv("DB_POOL_MIN", 2)),
+            max_size=int(os.getenv("DB_POOL_MAX", 20)),
+            **_connect_kwargs(),
+        )
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool():
+    if _pool is None:
+        raise RuntimeError("❌ 資料庫連線池尚未初始化，請先呼叫 init_pool()")
+    return _pool
+
+
+def to_db_time(dt):
+    # boss_tasks 使用 timestamp（無時區），存台北時間；asyncpg 不接受帶時區的值
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(TZ)
+    return dt.replace(tzinfo=None)
+
+
+async def hold_scheduler_lock():
+    """
+    多個 uvicorn worker 時只讓一個 worker 跑提醒與壓縮排程：
+    用一條獨立連線（不放回連線池）持有 session 層級的 advisory lock，連線斷掉時鎖自動釋放，由其他 worker 接手。
+    每次排程前呼叫，回傳本 worker 目前是否持有鎖。
+    """
+    global _scheduler_conn
+    async with _scheduler_guard:   # 提醒與壓縮兩個迴圈共用同一條連線
+        if _scheduler_conn is not None:
+            try:
+                await _scheduler_conn.fetchval("SELECT 1")
+                return True
+            except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError) as e:
+                print("⚠️ 排程鎖連線中斷，重新取得：", e)
+                _scheduler_conn.terminate()
+                _scheduler_conn = None
+
+        conn = await asyncpg.connect(**_connect_kwargs())
+        if await conn.fetchval("SELECT pg_try_advisory_lock(hashtext('boss_scheduler'))"):
+            _scheduler_conn = conn
+            return True
+        await conn.close()
+        return False
+
+
+async def release_scheduler_lock():
+    global _scheduler_conn
+    if _scheduler_conn is not None:
+        await _scheduler_conn.close()
+        _scheduler_conn = None
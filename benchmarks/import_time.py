@@ -0,0 +1,80 @@
+# 冷啟動 import 時間檢查：python benchmarks/import_time.py [--budget-ms 250] [--runs 5]
+# 以 python -X importtime -c "import app" 量測；超過預算，或啟動時就載入了應延遲載入的模組，回傳非 0
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 這些模組只能在第一次使用時才載入
+LAZY_MODULES = [
+    "linebot.v3.messaging",
+    "linebot.webhook",
+    "linebot.models",
+    "apscheduler",
+    "flex_templates",
+    "matplotlib",
+    "gtts",
+    "stats_manager",
+    "voice_manager",
+]
+
+LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure(target):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"❌ import {target} 失敗：\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            _, cumulative, indent, name = m.groups()
+            modules[name] = (int(cumulative), len(indent) // 2)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", default="app")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 250)))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure(args.target) for _ in range(args.runs)]
+    totals = sorted(r[args.target][0] / 1000 for r in runs)
+    best = totals[0]
+    median = totals[len(totals) // 2]
+    modules = runs[-1]
+
+    print(f"import {args.target}：best {best:.1f} ms / median {median:.1f} ms（預算 {args.budget_ms:.0f} ms）")
+    print("最慢的直接相依模組：")
+    direct = [(us, name) for name, (us, depth) in modules.items() if depth == 1]
+    for us, name in sorted(direct, reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager = [m for m in LAZY_MODULES if any(n == m or n.startswith(m + ".") for n in modules)]
+    if eager:
+        print("❌ 啟動時就載入了應延遲載入的模組：", ", ".join(eager))
+        failed = True
+    if median > args.budget_ms:
+        print(f"❌ import 時間超出預算：{median:.1f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✅ import 時間在預算內")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+# 重生提醒模擬器：以假時鐘、記憶體資料庫與假 MessagingApi 驅動 app.reminder_job
+#   python benchmarks/reminder_sim.py --groups 1000 --days 14
+# 重播數週的合成擊殺紀錄，回報提醒延遲分佈、漏發／重複提醒，以及每次排程的 CPU 時間
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SEED_ON_STARTUP", "0")
+
+import app  # noqa: E402
+import reminder  # noqa: E402
+import state  # noqa: E402
+from commands import TZ  # noqa: E402
+import linebot.v3.messaging.models  # noqa: E402,F401  先載入，避免第一次排程的 CPU 時間包含 import
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class InMemoryTaskStore:
+    """
+    模擬 boss_tasks 的目前紀錄：每個 (群組, BOSS) 只有一筆 NOT superseded。
+    以 respawn_time 排序的 heap 代替 idx_boss_tasks_due，fetch_due 只碰到期的紀錄。
+    """
+
+    def __init__(self):
+        self.tasks = {}    # task_id -> [group_id, name, respawn_time(naive), respawn_hours]
+        self.latest = {}   # (group_id, name) -> task_id
+        self.heap = []     # (respawn_time, task_id)，舊的項目在取出時略過
+        self.next_id = 1
+
+    def record_kill(self, group_id, name, respawn_hours, kill_time):
+        old = self.latest.pop((group_id, name), None)
+        if old is not None:
+            del self.tasks[old]
+        task_id = self.next_id
+        self.next_id += 1
+        respawn_time = (kill_time + timedelta(hours=respawn_hours)).replace(tzinfo=None)
+        self.tasks[task_id] = [group_id, name, respawn_time, respawn_hours]
+        self.latest[(group_id, name)] = task_id
+        heapq.heappush(self.heap, (respawn_time, task_id))
+
+    def current_respawn(self, group_id, name):
+        return self.tasks[self.latest[(group_id, name)]][2]
+
+    def fetch_due(self, until):
+        until = until.replace(tzinfo=None)
+        rows = []
+        while self.heap and self.heap[0][0] <= until:
+            respawn_time, task_id = heapq.heappop(self.heap)
+            task = self.tasks.get(task_id)
+            if task is None or task[2] != respawn_time:
+                continue
+            group_id, name, _, respawn_hours = task
+            rows.append((task_id, name, group_id, respawn_time, respawn_hours))
+        # 還沒被 update_respawn 推到下一次的紀錄要放回去
+        for task_id, _, _, respawn_time, _ in rows:
+            heapq.heappush(self.heap, (respawn_time, task_id))
+        return rows
+
+    def update_respawn(self, updates):
+        for task_id, _, next_respawn in updates:
+            task = self.tasks[task_id]
+            task[2] = next_respawn.replace(tzinfo=None)
+            heapq.heappush(self.heap, (task[2], task_id))
+
+    def close(self):
+        pass
+
+
+class FakeMessagingApi:
+    def __init__(self, clock, store):
+        self.clock = clock
+        self.store = store
+        self.sent = []   # (送出時間, group_id, BOSS 名稱, 對應的重生時間)
+
+    def push_message(self, push_message_request):
+        group_id = push_message_request.to
+        text = push_message_request.messages[0].text
+        name = text[1:text.index("*", 1)]
+        target = self.store.current_respawn(group_id, name)
+        self.sent.append((self.clock.now, group_id, name, target))
+
+
+def build_kills(bosses, args, start, end, rng):
+    """
+    合成擊殺：每個群組追蹤部分 BOSS；每次重生後有 kill_rate 的機率在 kill_delay 分鐘內被擊殺，
+    否則這一輪沒人打，等下一輪。回傳 (擊殺事件 heap, 應提醒的重生時間集合)。
+    """
+    kills = []
+    expected = set()
+    horizon = end - timedelta(seconds=args.window)
+    for g in range(args.groups):
+        group_id = f"C{g:032x}"
+        for boss in rng.sample(bosses, rng.randint(args.min_bosses, args.max_bosses)):
+            name, hours = boss["display_name"], boss["respawn_hours"]
+            period = timedelta(hours=hours)
+            kill_time = start + timedelta(seconds=rng.randrange(int(period.total_seconds())))
+            heapq.heappush(kills, (kill_time, group_id, name, hours))
+            respawn = kill_time + period
+            while respawn < end:
+                if respawn >= start + timedelta(seconds=args.window + args.tick) and respawn <= horizon:
+                    expected.add((group_id, name, respawn.replace(tzinfo=None)))
+                if rng.random() < args.kill_rate:
+                    kill_time = respawn + timedelta(seconds=rng.randrange(args.kill_delay * 60 + 1))
+                    if kill_time >= end:
+                        break
+                    heapq.heappush(kills, (kill_time, group_id, name, hours))
+                    respawn = kill_time + period
+                else:
+                    respawn += period
+    return kills, expected
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=1000)
+    parser.add_argument("--days", type=float, default=14)
+    parser.add_argument("--min-bosses", type=int, default=5)
+    parser.add_argument("--max-bosses", type=int, default=20)
+    parser.add_argument("--tick", type=int, default=60, help="排程間隔（秒）")
+    parser.add_argument("--tick-jitter", type=int, default=0, help="每次排程最多延遲幾秒才執行")
+    parser.add_argument("--window", type=int, default=reminder.REMINDER_WINDOW_SECONDS, help="提醒時間窗（秒）")
+    parser.add_argument("--kill-rate", type=float, default=0.85)
+    parser.add_argument("--kill-delay", type=int, default=20, help="重生後幾分鐘內被擊殺")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出結果")
+    args = parser.parse_args()
+
+    reminder.REMINDER_WINDOW_SECONDS = args.window
+    rng = random.Random(args.seed)
+    with open(os.path.join(ROOT, "boss_list.json"), encoding="utf-8") as f:
+        bosses = json.load(f)
+    args.max_bosses = min(args.max_bosses, len(bosses))
+
+    start = TZ.localize(datetime(2025, 1, 6, 0, 0, 0))
+    end = start + timedelta(days=args.days)
+    kills, expected = build_kills(bosses, args, start, end, rng)
+    total_kills = len(kills)
+
+    clock = FakeClock(start)
+    store = InMemoryTaskStore()
+    api = FakeMessagingApi(clock, store)
+
+    wall_started = time.perf_counter()
+    tick_cpu = []
+    tick = start
+    while tick < end:
+        clock.now = tick + timedelta(seconds=rng.randint(0, args.tick_jitter)) if args.tick_jitter else tick
+        while kills and kills[0][0] <= clock.now:
+            kill_time, group_id, name, hours = heapq.heappop(kills)
+            store.record_kill(group_id, name, hours, kill_time)
+
+        cpu_started = time.process_time()
+        app.reminder_job(clock=clock, store=store, messaging_api=api)
+        tick_cpu.append((time.process_time() - cpu_started) * 1000)
+        if state.scheduler_status["last_error"]:
+            raise RuntimeError(state.scheduler_status["last_error"])
+        tick += timedelta(seconds=args.tick)
+    wall = time.perf_counter() - wall_started
+
+    report(args, expected, api.sent, tick_cpu, total_kills, wall)
+
+
+def report(args, expected, sent, tick_cpu, total_kills, wall):
+    counts = Counter()
+    lateness = []
+    first_seen = set()
+    for sent_at, group_id, name, target in sent:
+        key = (group_id, name, target)
+        counts[key] += 1
+        if key not in first_seen:
+            first_seen.add(key)
+            # 延遲：相對於時間窗開啟（重生前 window 秒）晚了多久送出
+            window_open = TZ.localize(target) - timedelta(seconds=args.window)
+            lateness.append((sent_at - window_open).total_seconds())
+
+    reminded = {k for k in counts if k in expected}
+    missed = len(expected - reminded)
+    duplicates = sum(c - 1 for c in counts.values())
+    unexpected = sum(1 for k in counts if k not in expected)
+
+    result = {
+        "groups": args.groups,
+        "days": args.days,
+        "ticks": len(tick_cpu),
+        "kills": total_kills,
+        "expected_respawns": len(expected),
+        "pushes": len(sent),
+        "missed": missed,
+        "duplicates": duplicates,
+        "outside_horizon": unexpected,
+        "lateness_seconds": {
+            "p50": percentile(lateness, 50),
+            "p90": percentile(lateness, 90),
+            "p99": percentile(lateness, 99),
+            "max": max(lateness) if lateness else float("nan"),
+        },
+        "tick_cpu_ms": {
+            "mean": sum(tick_cpu) / len(tick_cpu),
+            "p50": percentile(tick_cpu, 50),
+            "p99": percentile(tick_cpu, 99),
+            "max": max(tick_cpu),
+        },
+        "wall_seconds": round(wall, 2),
+    }
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    print(f"模擬 {args.groups} 個群組 × {args.days} 天，{len(tick_cpu)} 次排程，{total_kills} 筆擊殺（實際耗時 {wall:.1f} 秒）")
+    print(f"應提醒的重生：{len(expected)}，送出提醒：{len(sent)}")
+    print(f"  漏發：{missed}（{missed / max(len(expected), 1):.2%}）")
+    print(f"  重複：{duplicates}（平均每次重生 {len(sent) / max(len(counts), 1):.2f} 則）")
+    lat = result["lateness_seconds"]
+    print(f"提醒延遲（相對重生前 {args.window} 秒）：p50 {lat['p50']:.0f}s / p90 {lat['p90']:.0f}s / p99 {lat['p99']:.0f}s / max {lat['max']:.0f}s")
+    buckets = Counter(int(v // 15) * 15 for v in lateness)
+    for b in sorted(buckets):
+        print(f"  {b:>4}–{b + 15:<4}s {buckets[b]:>8}  {'█' * int(40 * buckets[b] / len(lateness))}")
+    cpu = result["tick_cpu_ms"]
+    print(f"每次排程 CPU：mean {cpu['mean']:.3f} ms / p50 {cpu['p50']:.3f} ms / p99 {cpu['p99']:.3f} ms / max {cpu['max']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# 每個群組「用過的 BOSS」集合與 alias list 卡片快取
+# group_boss_usage 在擊殺時寫入（與 boss_tasks 同一個交易），clear all 時清空
+# （retention.compact 只清歷史，目前紀錄保留，所以不需要動這個集合）。
+# alias list 只需要這個集合加上別名表：別名表在行程內快取（alias add/del 時失效），
+# 渲染好的卡片依 (群組集合版本, 別名版本) 快取，命中時完全不查資料庫。
+# 版本號只在本行程內更新：多個 worker 時，其他 worker 的擊殺／別名變更要等 ALIAS_CARD_TTL_SECONDS 過期才會反映。
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import state
+from retention import SCHEMA_LOCK_SQL
+
+
+CARD_CACHE_SIZE = int(os.getenv("ALIAS_CARD_CACHE_SIZE", 1024))
+CARD_TTL_SECONDS = float(os.getenv("ALIAS_CARD_TTL_SECONDS", 60))
+
+USAGE_DDL = """
+    CREATE TABLE IF NOT EXISTS group_boss_usage (
+        group_id VARCHAR(255) NOT NULL,
+        boss_id INTEGER REFERENCES boss_list(id) ON DELETE CASCADE,
+        first_used_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (group_id, boss_id)
+    );
+"""
+
+RECORD_SQL = "INSERT INTO group_boss_usage (group_id, boss_id) VALUES (%s, %s) ON CONFLICT DO NOTHING"
+CLEAR_SQL = "DELETE FROM group_boss_usage WHERE group_id = %s"
+USED_SQL = "SELECT boss_id FROM group_boss_usage WHERE group_id = %s"
+ALIASES_SQL = """
+    SELECT a.boss_id, a.keyword, b.display_name
+    FROM boss_aliases a
+    JOIN boss_list b ON a.boss_id = b.id
+    ORDER BY b.display_name, a.keyword
+"""
+
+MISS = object()
+
+_lock = threading.Lock()
+_cards = OrderedDict()      # group_id -> ((usage_version, alias_version), expires_at, bubble)
+_aliases = (None, 0.0, [])  # (alias_version, expires_at, [(boss_id, keyword, display_name)])
+
+
+def ensure_schema(conn):
+    # 集合是空的、但 boss_tasks 已有目前紀錄時（剛建立，或先套用了 models_postgresql.sql）從 boss_tasks 回填
+    cursor = conn.cursor()
+    cursor.execute(SCHEMA_LOCK_SQL)   # 多個 worker 同時啟動時依序建立／回填
+    cursor.execute(USAGE_DDL)
+    cursor.execute("""
+        SELECT NOT EXISTS (SELECT 1 FROM group_boss_usage)
+           AND EXISTS (SELECT 1 FROM boss_tasks WHERE NOT superseded)
+    """)
+    if cursor.fetchone()[0]:
+        cursor.execute("""
+            INSERT INTO group_boss_usage (group_id, boss_id, first_used_at)
+            SELECT group_id, boss_id, MIN(kill_time) FROM boss_tasks
+            WHERE NOT superseded
+            GROUP BY group_id, boss_id
+            ON CONFLICT DO NOTHING
+        """)
+        print(f"✅ 已回填 group_boss_usage（{cursor.rowcount} 筆）")
+    conn.commit()
+    cursor.close()
+
+
+def record(cursor, group_id, boss_id):
+    # 擊殺交易內呼叫；回傳是否為本群第一次使用這隻 BOSS（commit 後要呼叫 state.bump_group_usage）
+    cursor.execute(RECORD_SQL, (group_id, boss_id))
+    return cursor.rowcount > 0
+
+
+def cached_card(group_id):
+    """
+    回傳 (versions, bubble)；bubble 為 MISS 時呼叫端要載入資料後呼叫 build_card(group_id, versions, ...)。
+    沒有任何別名可列時 bubble 為 None。
+    """
+    versions = (state.group_usage_version(group_id), state.alias_version())
+    with _lock:
+        entry = _cards.get(group_id)
+        if entry is not None and entry[0] == versions and time.monotonic() < entry[1]:
+            _cards.move_to_end(group_id)
+            return versions, entry[2]
+    return versions, MISS
+
+
+def aliases_stale(versions):
+    return _aliases[0] != versions[1] or time.monotonic() >= _aliases[1]
+
+
+def build_card(group_id, versions, used_boss_ids, alias_rows=None):
+    # alias_rows：aliases_stale() 時由呼叫端以 ALIASES_SQL 載入，否則沿用快取的別名表
+    global _aliases
+    from flex_templates import build_alias_bubble
+
+    expires_at = time.monotonic() + CARD_TTL_SECONDS
+    if alias_rows is not None:
+        _aliases = (versions[1], expires_at, [tuple(r) for r in alias_rows])
+    used = set(used_boss_ids)
+    rows = [(keyword, name) for boss_id, keyword, name in _aliases[2] if boss_id in used]
+    bubble = build_alias_bubble(rows) if rows else None
+
+    with _lock:
+        _cards[group_id] = (versions, expires_at, bubble)
+        _cards.move_to_end(group_id)
+        while len(_cards) > CARD_CACHE_SIZE:
+            _cards.popitem(last=False)
+    return bubble
+
+
+def alias_card(group_id, connect):
+    # 同步版：快取命中時不連資料庫；未命中時最多兩個查詢（本群集合走主鍵、別名表只在變動後重載）
+    versions, bubble = cached_card(group_id)
+    if bubble is not MISS:
+        return bubble
+
+    conn = connect()
+    cursor = conn.cursor()
+    alias_rows = None
+    if aliases_stale(versions):
+        cursor.execute(ALIASES_SQL)
+        alias_rows = cursor.fetchall()
+    cursor.execute(USED_SQL, (group_id,))
+    used = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    return build_card(group_id, versions, used, alias_rows)
@@ -0,0 +1,72 @@
+# 指令解析模組（同步 Flask 與非同步 ASGI 共用，不含任何 I/O）
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+import pytz
+
+
+TZ_NAME = "Asia/Taipei"
+TZ = pytz.timezone(TZ_NAME)
+# 台灣自 1980 年起沒有日光節約時間，固定 UTC+8；比 TZ.localize 快一個數量級
+_TAIPEI_OFFSET = timezone(timedelta(hours=8))
+
+# keyword：BOSS 關鍵字；kill_time：死亡時間；not_found_msg：查無關鍵字時的回覆；
+# explicit：是否指定了時間（k 克4 170124、kr1、kr2）
+KillCommand = namedtuple("KillCommand", ["keyword", "kill_time", "not_found_msg", "explicit"])
+
+
+def to_taipei(dt):
+    # 資料庫存的是台北時間（timestamp 無時區，所有連線的 session TimeZone 都設為 TZ_NAME），讀回來時補上時區
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=_TAIPEI_OFFSET)
+    return dt.astimezone(TZ)
+
+
+def parse_kill_command(text, now=None):
+    """
+    解析 k / kr1 / kr2 擊殺指令。
+    非擊殺指令回傳 None；格式錯誤時丟出 ValueError，訊息即為要回覆的文字。
+    """
+    now = now or datetime.now(TZ)
+    lowered = text.lower()
+
+    # 處理 K 克4 170124（當日指定時間）
+    if lowered.startswith("k "):
+        parts = text.split()
+        if len(parts) == 3 and parts[2].isdigit() and len(parts[2]) == 6:
+            _, keyword, timestr = parts
+            try:
+                kill_time = _replace_time(now, timestr)
+            except ValueError:
+                raise ValueError("❌ 時間格式錯誤，請使用 K 克4 170124 的格式。")
+            return KillCommand(keyword.lower(), kill_time, "❌ 找不到該 BOSS 關鍵字。", True)
+
+    # 處理 kr1、kr2 克4 170124 格式，指定前日或前兩日死亡時間
+    if lowered.startswith("kr1 ") or lowered.startswith("kr2 "):
+        parts = text.split()
+        if len(parts) != 3:
+            raise ValueError("❌ 指令格式錯誤，請使用 kr1 克4 170124 的格式。")
+        prefix, keyword, timestr = parts
+        offset_days = 1 if prefix.lower() == "kr1" else 2
+        try:
+            kill_time = _replace_time(now - timedelta(days=offset_days), timestr)
+        except ValueError:
+            raise ValueError("❌ 時間格式錯誤，請使用 kr1 克4 170124 的格式。")
+        return KillCommand(keyword.lower(), kill_time, "❌ 找不到該 BOSS 關鍵字。", True)
+
+    # 處理 K、k 指令作為擊殺紀錄（現在時間）
+    if lowered.startswith("k "):
+        keyword = text[2:].strip()
+        return KillCommand(keyword.lower(), now, "❌ 無法辨識的關鍵字，請先使用 add 指令新增。", False)
+
+    return None
+
+
+def _replace_time(day, timestr):
+    hour = int(timestr[0:2])
+    minute = int(timestr[2:4])
+    second = int(timestr[4:6])
+    return day.replace(hour=hour, minute=minute, second=second, microsecond=0)
+
+
+def kill_message(display_name, kill_time, respawn_time):
+    return f"\n\n🔴 擊殺：{display_name}\n🕓 死亡：{kill_time.strftime('%Y-%m-%d %H:%M:%S')}\n🟢 重生：{respawn_time.strftime('%Y-%m-%d %H:%M:%S')}"
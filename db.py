@@ -1,23 +1,145 @@
+# 資料庫連線：寫入一律走主庫（DB_HOST），唯讀查詢可分流到唯讀副本（DB_READ_HOST）
+#   DB_READ_HOST / DB_READ_PORT / DB_READ_USER / DB_READ_PASSWORD / DB_READ_NAME
+#     未設定 DB_READ_HOST 時所有查詢都走主庫；其餘未設定的欄位沿用主庫設定
+#   DB_READ_MAX_LAG_SECONDS（預設 5）：副本落後超過這個秒數就改讀主庫
+#   DB_READ_LAG_CHECK_SECONDS（預設 2）：多久重新檢查一次副本延遲（檢查用的就是當次取得的連線）
+#   READ_YOUR_WRITES_SECONDS（預設 10）：群組剛寫入（擊殺、clear all…）後這段時間內，該群組的讀取改走主庫，
+#     讓 k 之後馬上 出 一定看得到剛剛的擊殺；應大於 DB_READ_MAX_LAG_SECONDS + DB_READ_LAG_CHECK_SECONDS
+# 最後寫入時間記在 state（行程記憶體），多個 worker 時只對同一個 worker 有效
 import os
+import threading
+import time
 import psycopg2
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 
+import state
+from commands import TZ, TZ_NAME
+
 load_dotenv()
 
+READ_MAX_LAG_SECONDS = float(os.getenv("DB_READ_MAX_LAG_SECONDS", 5))
+READ_LAG_CHECK_SECONDS = float(os.getenv("DB_READ_LAG_CHECK_SECONDS", 2))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 10))
+READ_CONNECT_TIMEOUT = int(os.getenv("DB_READ_CONNECT_TIMEOUT", 2))
+
+# boss_tasks 的時間欄位是 timestamp（無時區），一律存台北時間：psycopg2 送出帶時區的 datetime 時，
+# Postgres 會換算成 session TimeZone，所以每條連線都要設成台北，不能依賴伺服器預設（Railway 為 UTC）
+CONNECT_OPTIONS = f"-c timezone={TZ_NAME}"
+
+# 主庫沒有新寫入時 pg_last_xact_replay_timestamp() 不會前進，所以 WAL 已全部重播時視為沒有延遲；
+# 但 WAL receiver 斷線時收到的也會全部重播完，必須確認還在 streaming，否則回傳 NULL（不可用）。
+# 非 superuser 需要 pg_read_all_stats 權限才看得到 pg_stat_wal_receiver.status
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_replica_lock = threading.Lock()
+replica_status = {
+    "enabled": False,
+    "usable": False,
+    "lag_seconds": None,
+    "checked_at": None,
+    "error": None,
+}
+_replica_checked = 0.0
+
+
 def get_db_connection():
-    required_vars = ["DB_HOST", "DB_PORT", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+    required_vars = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
     for var in required_vars:
         if not os.getenv(var):
             raise EnvironmentError(f"❌ 缺少資料庫設定變數：{var}")
     return psycopg2.connect(
         host=os.getenv("DB_HOST"),
-        port=int(os.getenv("DB_PORT")),
+        port=int(os.getenv("DB_PORT") or 5432),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASSWORD"),
-        dbname=os.getenv("DB_NAME")
+        dbname=os.getenv("DB_NAME"),
+        options=CONNECT_OPTIONS,
     )
 
+
+def get_read_connection(group_ids=None):
+    """
+    唯讀查詢用的連線。group_ids：這次讀取涉及的群組，其中有群組剛寫入過就走主庫；
+    None 表示不限群組（任何群組剛寫入過都走主庫），() 表示不需要 read-your-writes（例如排程掃描）。
+    副本未設定、連不上或落後超過 READ_MAX_LAG_SECONDS 時也走主庫。
+    """
+    if not os.getenv("DB_READ_HOST"):
+        return get_db_connection()
+    if time.monotonic() - state.last_write(group_ids) < READ_YOUR_WRITES_SECONDS:
+        return get_db_connection()
+
+    recheck = time.monotonic() - _replica_checked >= READ_LAG_CHECK_SECONDS
+    if not recheck and not replica_status["usable"]:
+        return get_db_connection()
+
+    conn = None
+    try:
+        conn = _connect_replica()
+        if recheck:
+            cursor = conn.cursor()
+            cursor.execute(REPLICA_LAG_SQL)
+            lag = cursor.fetchone()[0]
+            cursor.close()
+            conn.rollback()
+            if lag is None:
+                _set_replica(False, None, "WAL receiver 未在 streaming")
+            else:
+                lag = float(lag)
+                _set_replica(lag <= READ_MAX_LAG_SECONDS, lag)
+    except psycopg2.Error as e:
+        if conn is not None:
+            conn.close()
+        _set_replica(False, None, str(e).strip())
+        return get_db_connection()
+
+    if not replica_status["usable"]:
+        conn.close()
+        return get_db_connection()
+    return conn
+
+
+def _connect_replica():
+    return psycopg2.connect(
+        host=os.getenv("DB_READ_HOST"),
+        port=int(os.getenv("DB_READ_PORT") or os.getenv("DB_PORT") or 5432),
+        user=os.getenv("DB_READ_USER") or os.getenv("DB_USER"),
+        password=os.getenv("DB_READ_PASSWORD") or os.getenv("DB_PASSWORD"),
+        dbname=os.getenv("DB_READ_NAME") or os.getenv("DB_NAME"),
+        connect_timeout=READ_CONNECT_TIMEOUT,
+        options=CONNECT_OPTIONS,
+    )
+
+
+def _set_replica(usable, lag, error=None):
+    global _replica_checked
+    with _replica_lock:
+        was_enabled = replica_status["enabled"]
+        was_usable = replica_status["usable"]
+        _replica_checked = time.monotonic()
+        replica_status.update(
+            enabled=True,
+            usable=usable,
+            lag_seconds=None if lag is None else round(lag, 3),
+            checked_at=datetime.now(TZ).isoformat(),
+            error=error,
+        )
+    if was_usable and not usable:
+        reason = error or f"延遲 {lag:.1f} 秒"
+        print(f"⚠️ 唯讀副本暫停使用（{reason}），改讀主庫")
+    elif usable and not was_usable:
+        action = "恢復使用" if was_enabled else "啟用"
+        print(f"✅ 唯讀副本{action}（延遲 {lag:.1f} 秒）")
+    elif not usable and not was_enabled:
+        print(f"⚠️ 唯讀副本無法使用（{error or f'延遲 {lag:.1f} 秒'}），改讀主庫")
+
 def get_boss_info_by_keyword(keyword):
     conn = get_db_connection()
     try:
@@ -0,0 +1,142 @@
+# 指令分派（同步 Flask 與非同步 ASGI 共用）：指令判斷、回覆文字、寫入後要更新的版本號都在這裡，
+# 資料庫 I/O 由呼叫端的 store 負責（app.CommandStore / asgi_app.AsyncCommandStore），兩邊不會各改各的
+#
+# handle_command 是 generator：需要資料庫時 yield (操作, 參數...)，由 run / run_async 呼叫
+# store.<操作>(group_id, 參數...) 後把結果送回，最後 return Reply。store 的操作與回傳值：
+#   record_kill(kill)                 找不到關鍵字回傳 None，否則 (display_name, respawn_time, 是否第一次使用這隻 BOSS)
+#   clear_group()                     刪除本群 boss_tasks 與 group_boss_usage
+#   board()                           (重生表 bubble, 是否回寫了重生時間)
+#   delete_alias(keyword)
+#   alias_target(keyword)             對應的 display_name，找不到回傳 None
+#   alias_card()                      本群別名卡片 bubble，沒有資料時回傳 None
+#   add_alias(keyword, target_name)   找不到 target_name 回傳 False
+from collections import namedtuple
+
+import state
+from commands import parse_kill_command, kill_message
+
+
+# push=True 時以 push 送出（原本的 echo 行為），否則用 reply token 回覆
+Reply = namedtuple("Reply", "text contents push", defaults=(None, False))
+
+NOT_GROUP_MSG = "⚠️ 此功能僅限群組使用"
+
+
+def is_group(group_id):
+    return bool(group_id) and group_id.startswith("C")
+
+
+def handle_command(group_id, text):
+    text = text.strip()
+
+    # 處理 k / kr1 / kr2 擊殺指令
+    try:
+        kill = parse_kill_command(text)
+    except ValueError as e:
+        return Reply(str(e))
+    if kill:
+        written = yield ("record_kill", kill)
+        if written is None:
+            return Reply(kill.not_found_msg)
+        display_name, respawn_time, _ = written
+        return Reply(kill_message(display_name, kill.kill_time, respawn_time))
+
+    text = text.lower()
+
+    # 處理 clear all 指令：清除該群組所有 BOSS 紀錄
+    if text == "clear all":
+        yield ("clear_group",)
+        return Reply("✅ 已清除本群組所有 BOSS 紀錄")
+
+    if text in ["kb all", "出"]:
+        bubble, _ = yield ("board",)
+        return Reply("🕓 即將重生 BOSS", bubble)
+
+    # ✅ ALIAS 指令管理區段
+    if text.startswith("alias ") or text.startswith("add "):
+        parts = text.split()
+        if len(parts) < 2:
+            return Reply("⚠️ 格式錯誤，請使用：alias 別名 正式名稱")
+
+        subcommand = parts[1]
+
+        # alias del keyword
+        if subcommand == "del" and len(parts) == 3:
+            keyword = parts[2]
+            yield ("delete_alias", keyword)
+            return Reply(f"🗑️ 已刪除別名「{keyword}」")
+
+        # alias check keyword
+        if subcommand == "check" and len(parts) == 3:
+            keyword = parts[2]
+            display_name = yield ("alias_target", keyword)
+            if display_name:
+                return Reply(f"🔍 「{keyword}」 對應 BOSS：{display_name}")
+            return Reply(f"❌ 找不到「{keyword}」的對應 BOSS")
+
+        # ✅ alias list（只顯示本群使用過的 BOSS）
+        if subcommand == "list":
+            bubble = yield ("alias_card",)
+            if not bubble:
+                return Reply("📭 本群組尚未使用過任何別名。")
+            return Reply("本群別名清單", bubble)
+
+        # alias 新增 keyword → display_name
+        if len(parts) >= 3:
+            keyword = parts[1]
+            target_name = parts[2]
+            if (yield ("add_alias", keyword, target_name)):
+                return Reply(f"✅ 已將「{keyword}」設定為「{target_name}」的別名！")
+            return Reply(f"❌ 找不到名稱為「{target_name}」的 BOSS。")
+
+    return Reply("你輸入了 ..." + text, push=True)
+
+
+def apply_writes(group_id, op, result):
+    # 寫入成功後更新行程內版本號（快取失效、read-your-writes）；在 store 操作完成後立刻呼叫
+    if op == "record_kill" and result is not None:
+        state.bump_group(group_id)
+        if result[2]:
+            state.bump_group_usage(group_id)
+    elif op == "clear_group":
+        state.bump_group(group_id)
+        state.bump_group_epoch(group_id)
+        state.bump_group_usage(group_id)
+    elif op == "board" and result[1]:
+        state.bump_group(group_id)
+    elif op == "delete_alias" or (op == "add_alias" and result):
+        state.bump_aliases()
+
+
+def run(group_id, text, store, wrap=None):
+    """
+    同步版：依序執行 handle_command 需要的操作。
+    wrap(group_id, op, call) 可以包住單一操作（同步版用來做擊殺去重與查詢共用），call() 會執行操作並更新版本號。
+    """
+    steps = handle_command(group_id, text)
+    result = None
+    while True:
+        try:
+            op = steps.send(result)
+        except StopIteration as done:
+            return done.value
+
+        def call(op=op):
+            value = getattr(store, op[0])(group_id, *op[1:])
+            apply_writes(group_id, op[0], value)
+            return value
+
+        result = wrap(group_id, op, call) if wrap else call()
+
+
+async def run_async(group_id, text, store):
+    # 非同步版：store 的操作都是 coroutine；admission 的去重／共用是以執行緒等待實作，這裡不套用
+    steps = handle_command(group_id, text)
+    result = None
+    while True:
+        try:
+            op = steps.send(result)
+        except StopIteration as done:
+            return done.value
+        result = await getattr(store, op[0])(group_id, *op[1:])
+        apply_writes(group_id, op[0], result)
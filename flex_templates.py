@@ -0,0 +1,142 @@
+# Flex Message 卡片模板（kb all 重生表、alias list 別名清單）
+from datetime import timedelta
+
+from commands import to_taipei
+
+
+YELLOW_LIST = [
+    "被汙染的克魯瑪", "司穆艾爾", "提米特利斯", "突變克魯瑪", "黑色蕾爾莉",
+    "寇倫", "提米妮爾", "卡坦", "蘭多勒", "貝希莫斯", "薩班", "史坦",
+    "忘卻之鏡", "大地祭壇", "水之祭壇", "風之祭壇", "黑闇祭壇", "克拉奇",
+    "梅杜莎", "沙勒卡", "塔拉金"
+]
+
+PURPLE_LIST = [
+    "黑卡頓", "塔那透斯", "巴倫", "摩德烏斯", "歐克斯", "薩拉克斯", "哈普", "霸拉克",
+    "安德拉斯", "納伊阿斯", "核心基座", "巨蟻女王", "卡布里歐", "鳳凰", "猛龍獸",
+    "奧爾芬", "弗林特", "拉何"
+]
+
+
+def _board_row(name, text, color, weight="regular"):
+    text_block = {
+        "type": "text",
+        "text": text,
+        "color": color,
+        "weight": weight,
+        "size": "sm",
+        "wrap": True
+    }
+    box = {
+        "type": "box",
+        "layout": "vertical",
+        "contents": [text_block]
+    }
+    if name in YELLOW_LIST:
+        box["backgroundColor"] = "#FFF9DC"  # 淡鵝黃色
+    elif name in PURPLE_LIST:
+        box["backgroundColor"] = "#F5F0FF"  # 淡粉紫色
+    return box
+
+
+def build_board_bubble(rows, now):
+    """
+    rows：(display_name, task_id, kill_time, respawn_time, respawn_hours)，依顯示順序排列。
+    回傳 (bubble, updates)；updates 為 [(task_id, 新的 respawn_time)]，由呼叫端寫回資料庫。
+    """
+    soon = now + timedelta(minutes=30)
+    flex_contents = []
+    updates = []
+
+    for name, task_id, kill_time, _, respawn_hours in rows:
+        # hours 應該是 int
+        if not isinstance(respawn_hours, (int, float)):
+            print("❌ hours 傳錯型別！內容：", respawn_hours, type(respawn_hours))
+            continue  # 跳過，避免崩潰
+
+        # 判斷有無紀錄
+        if not kill_time:
+            flex_contents.append({
+                "type": "box",
+                "layout": "vertical",
+                "contents": [{
+                    "type": "text",
+                    "text": f"__:__:__ {name}",
+                    "color": "#CCCCCC",
+                    "size": "sm",
+                    "wrap": True
+                }]
+            })
+            continue
+
+        respawn_time = to_taipei(kill_time) + timedelta(hours=respawn_hours)
+        if now < respawn_time <= soon:
+            flex_contents.append(_board_row(
+                name, f"🔥 {respawn_time.strftime('%H:%M:%S')} {name}（快重生）", "#D60000", "bold"
+            ))
+        elif now > respawn_time:
+            diff = (now - respawn_time).total_seconds()
+            passed = int(diff // (respawn_hours * 3600))
+            if passed >= 1:
+                respawn_time += timedelta(hours=passed * respawn_hours)
+                updates.append((task_id, respawn_time))
+            note = f"（過{passed}）" if passed >= 1 else ""
+            flex_contents.append(_board_row(
+                name, f"{respawn_time.strftime('%H:%M:%S')} {name}{note}", "#999999"
+            ))
+        else:
+            flex_contents.append(_board_row(
+                name, f"{respawn_time.strftime('%H:%M:%S')} {name}", "#000000"
+            ))
+
+    bubble = {
+        "type": "bubble",
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "paddingAll": "md",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": "🕓 即將重生 BOSS",
+                    "weight": "bold",
+                    "size": "md",
+                    "margin": "md"
+                },
+                {
+                    "type": "separator",
+                    "margin": "md"
+                },
+                *flex_contents
+            ]
+        }
+    }
+    return bubble, updates
+
+
+def build_alias_bubble(rows):
+    # rows：(keyword, display_name)
+    alias_contents = [
+        {
+            "type": "box",
+            "layout": "horizontal",
+            "contents": [
+                {"type": "text", "text": k, "size": "sm", "flex": 2, "weight": "bold"},
+                {"type": "text", "text": "→", "size": "sm", "flex": 1},
+                {"type": "text", "text": n, "size": "sm", "flex": 5}
+            ]
+        } for k, n in rows
+    ]
+
+    return {
+        "type": "bubble",
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {"type": "text", "text": "📘 本群組別名清單", "weight": "bold", "size": "md", "margin": "md"},
+                {"type": "separator", "margin": "md"},
+                *alias_contents
+            ]
+        }
+    }
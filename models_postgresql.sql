@@ -1,7 +1,7 @@
 -- 建立 boss_list 表
 CREATE TABLE IF NOT EXISTS boss_list (
     id SERIAL PRIMARY KEY,
-    display_name VARCHAR(255) NOT NULL,
+    display_name VARCHAR(255) UNIQUE NOT NULL,  -- seed.auto_insert_boss_list 以 display_name 做 upsert
     respawn_hours INTEGER DEFAULT 8
 );
 
@@ -12,11 +12,38 @@ CREATE TABLE IF NOT EXISTS boss_aliases (
     keyword VARCHAR(255) UNIQUE NOT NULL
 );
 
--- 建立 boss_tasks 表
+-- 建立 boss_tasks 表（依 kill_time 按月分割，與 retention.BOSS_TASKS_DDL 相同）
+-- 月份分割 boss_tasks_pYYYYMM 由 retention.ensure_partitions() 建立，過期分割由 retention.compaction_job() 清除
 CREATE TABLE IF NOT EXISTS boss_tasks (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL,
     boss_id INTEGER REFERENCES boss_list(id) ON DELETE CASCADE,
     group_id VARCHAR(255) NOT NULL,
     kill_time TIMESTAMP NOT NULL,
-    respawn_time TIMESTAMP NOT NULL
+    respawn_time TIMESTAMP NOT NULL,
+    superseded BOOLEAN NOT NULL DEFAULT FALSE,  -- 被同群組同 BOSS 較新的擊殺取代
+    PRIMARY KEY (id, kill_time)
+) PARTITION BY RANGE (kill_time);
+
+CREATE TABLE IF NOT EXISTS boss_tasks_default PARTITION OF boss_tasks DEFAULT;
+
+-- 每個 (群組, BOSS) 的目前紀錄：kb all、alias list、擊殺時標記 superseded、/api/boards
+CREATE INDEX IF NOT EXISTS idx_boss_tasks_current
+    ON boss_tasks (group_id, boss_id) INCLUDE (id, kill_time, respawn_time)
+    WHERE NOT superseded;
+
+-- reminder_job 只撈即將到期（或已過期）的目前紀錄
+CREATE INDEX IF NOT EXISTS idx_boss_tasks_due
+    ON boss_tasks (respawn_time) INCLUDE (group_id, boss_id)
+    WHERE NOT superseded;
+
+-- clear all 與依群組查歷史
+CREATE INDEX IF NOT EXISTS idx_boss_tasks_group_kill
+    ON boss_tasks (group_id, kill_time DESC);
+
+-- 建立 group_boss_usage 表：每個群組用過的 BOSS（alias list 用，與 boss_usage.USAGE_DDL 相同）
+CREATE TABLE IF NOT EXISTS group_boss_usage (
+    group_id VARCHAR(255) NOT NULL,
+    boss_id INTEGER REFERENCES boss_list(id) ON DELETE CASCADE,
+    first_used_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (group_id, boss_id)
 );
@@ -0,0 +1,212 @@
+# 線上效能分析（需設定 PROFILER_TOKEN 才會啟用，請求需帶 X-Profiler-Token 標頭；不接受 query string，避免 token 留在存取紀錄）
+#   POST /debug/profiler/start?interval_ms=10&seconds=60   開始取樣 callback / command / reminder_job 執行緒
+#   POST /debug/profiler/stop                              停止取樣並回傳 collapsed stacks
+#   GET  /debug/profiler                                   目前累積的 collapsed stacks（可直接丟給 flamegraph.pl / speedscope）
+#   POST /debug/profiler/slow?threshold_ms=500             開啟慢請求 cProfile（threshold_ms=0 關閉）
+#   GET  /debug/profiler/slow                              最近的慢請求列表
+#   GET  /debug/profiler/slow/<n>                          第 n 筆慢請求的 pstats 報表
+# 慢請求 cProfile 也可以用環境變數 PROFILE_SLOW_MS 在啟動時開啟；
+# cProfile 是整個行程共用的（3.12 起佔用 sys.monitoring 的 profiler 欄位），同一時間只分析一個請求
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import Blueprint, Response, abort, jsonify, request
+
+from commands import TZ
+
+
+profiler_bp = Blueprint("profiler", __name__, url_prefix="/debug/profiler")
+
+MAX_PROFILE_SECONDS = 600
+SLOW_CAPTURES = 20
+
+_lock = threading.Lock()
+_tracked = {}          # thread ident -> 標籤（callback / command / reminder_job）
+_stacks = Counter()    # collapsed stack -> 取樣次數
+_sampler = None
+_stop_event = threading.Event()
+_sampler_info = {"running": False, "interval_ms": None, "started_at": None, "samples": 0}
+
+_slow_threshold_ms = float(os.getenv("PROFILE_SLOW_MS", 0))
+_slow_captures = deque(maxlen=SLOW_CAPTURES)
+_slow_lock = threading.Lock()
+
+
+@contextmanager
+def track(label):
+    # 標記目前執行緒，取樣器只看被標記的執行緒；未取樣時成本只有一次 dict 寫入
+    ident = threading.get_ident()
+    previous = _tracked.get(ident)
+    if previous is None:
+        _tracked[ident] = label
+    try:
+        yield
+    finally:
+        if previous is None:
+            _tracked.pop(ident, None)
+
+
+@contextmanager
+def profile_if_slow(label):
+    # 慢請求 cProfile：只有開啟時才掛上 profiler，超過門檻才保留結果
+    # 已經有其他請求在分析時這次就不分析，請求本身照常執行
+    threshold = _slow_threshold_ms
+    if not threshold or not _slow_lock.acquire(blocking=False):
+        yield
+        return
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # 其他 profiling 工具（例如除錯器）佔用中
+        _slow_lock.release()
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.disable()
+        _slow_lock.release()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= threshold:
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(40)
+            _slow_captures.append({
+                "label": label,
+                "at": datetime.now(TZ).isoformat(),
+                "elapsed_ms": round(elapsed_ms, 1),
+                "report": out.getvalue(),
+            })
+
+
+def start(interval_ms=10, seconds=60):
+    global _sampler
+    with _lock:
+        if _sampler is not None and _sampler.is_alive():
+            return False
+        _stacks.clear()
+        _stop_event.clear()
+        _sampler_info.update(
+            running=True,
+            interval_ms=interval_ms,
+            started_at=datetime.now(TZ).isoformat(),
+            samples=0,
+        )
+        _sampler = threading.Thread(
+            target=_sample_loop, args=(interval_ms / 1000, seconds), name="profiler-sampler", daemon=True
+        )
+        _sampler.start()
+    return True
+
+
+def stop():
+    _stop_event.set()
+    sampler = _sampler
+    if sampler is not None:
+        sampler.join()
+    return collapsed()
+
+
+def collapsed():
+    with _lock:
+        items = sorted(_stacks.items(), key=lambda kv: kv[1], reverse=True)
+    return "".join(f"{stack} {count}\n" for stack, count in items)
+
+
+def _sample_loop(interval, seconds):
+    deadline = time.monotonic() + seconds
+    own = threading.get_ident()
+    while not _stop_event.is_set() and time.monotonic() < deadline:
+        frames = sys._current_frames()
+        batch = []
+        for ident, label in list(_tracked.items()):
+            frame = frames.get(ident)
+            if frame is None or ident == own:
+                continue
+            batch.append(_collapse(label, frame))
+        del frames
+        with _lock:
+            _stacks.update(batch)
+            _sampler_info["samples"] += 1
+        _stop_event.wait(interval)
+    _sampler_info["running"] = False
+
+
+def _collapse(label, frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.append(label)
+    return ";".join(reversed(names))
+
+
+def _check_token():
+    token = os.getenv("PROFILER_TOKEN")
+    if not token:
+        abort(404)
+    given = request.headers.get("X-Profiler-Token", "")
+    if not hmac.compare_digest(given.encode("utf-8"), token.encode("utf-8")):
+        abort(403)
+
+
+@profiler_bp.before_request
+def _require_token():
+    _check_token()
+
+
+@profiler_bp.route("/start", methods=["POST"])
+def start_route():
+    interval_ms = min(max(request.args.get("interval_ms", 10, type=float), 1), 1000)
+    seconds = min(max(request.args.get("seconds", 60, type=float), 1), MAX_PROFILE_SECONDS)
+    if not start(interval_ms, seconds):
+        return jsonify(error="profiler already running", **_sampler_info), 409
+    return jsonify(_sampler_info)
+
+
+@profiler_bp.route("/stop", methods=["POST"])
+def stop_route():
+    return Response(stop(), mimetype="text/plain")
+
+
+@profiler_bp.route("", methods=["GET"])
+def collapsed_route():
+    return Response(collapsed(), mimetype="text/plain", headers={"X-Profiler-Samples": str(_sampler_info["samples"])})
+
+
+@profiler_bp.route("/slow", methods=["POST"])
+def slow_config_route():
+    global _slow_threshold_ms
+    _slow_threshold_ms = max(request.args.get("threshold_ms", 0, type=float), 0)
+    return jsonify(threshold_ms=_slow_threshold_ms)
+
+
+@profiler_bp.route("/slow", methods=["GET"])
+def slow_list_route():
+    return jsonify(
+        threshold_ms=_slow_threshold_ms,
+        captures=[
+            {"index": i, "label": c["label"], "at": c["at"], "elapsed_ms": c["elapsed_ms"]}
+            for i, c in enumerate(_slow_captures)
+        ],
+    )
+
+
+@profiler_bp.route("/slow/<int:index>", methods=["GET"])
+def slow_report_route(index):
+    captures = list(_slow_captures)
+    if index >= len(captures):
+        abort(404)
+    return Response(captures[index]["report"], mimetype="text/plain")
@@ -0,0 +1,110 @@
+# BOSS 重生提醒邏輯（app.reminder_job、asgi_app.reminder_job 與 benchmarks/reminder_sim.py 共用）
+import os
+from datetime import timedelta
+
+import state
+from commands import to_taipei
+
+
+REMINDER_WINDOW_SECONDS = int(os.getenv("REMINDER_WINDOW_SECONDS", 120))
+
+# 只取 respawn_time 落在提醒時間窗內（或已過期）的目前紀錄；idx_boss_tasks_due 讓這裡不用掃歷史
+DUE_TASKS_SQL = """
+    SELECT
+        t.id,
+        b.display_name,
+        t.group_id,
+        t.respawn_time,
+        b.respawn_hours
+    FROM boss_tasks t
+    JOIN boss_list b ON t.boss_id = b.id
+    WHERE t.respawn_time <= %s AND NOT t.superseded
+"""
+
+
+def plan_reminders(rows, now, window_seconds=None):
+    """
+    rows：(task_id, display_name, group_id, respawn_time, respawn_hours)
+    回傳 (updates, pushes)：
+      updates：[(task_id, group_id, next_respawn)]，已過期的重生時間往後推到下一次
+      pushes：[(group_id, msg)]，下一次重生落在 window_seconds 內的提醒
+    """
+    if window_seconds is None:
+        window_seconds = REMINDER_WINDOW_SECONDS
+    updates = []
+    pushes = []
+    for task_id, name, group_id, respawn_time, respawn_hours in rows:
+        if not group_id or not group_id.startswith("C"):
+            continue
+        if respawn_time is None:
+            continue
+
+        # 計算實際下一次應重生的時間（若已過期則加上整數個週期直到未來）
+        next_respawn = to_taipei(respawn_time)
+        passed = 0
+        if next_respawn < now:
+            period = timedelta(hours=respawn_hours)
+            passed = -(-(now - next_respawn) // period)
+            next_respawn += passed * period
+            updates.append((task_id, group_id, next_respawn))
+
+        if 0 <= (next_respawn - now).total_seconds() <= window_seconds:
+            suffix = f"（過{passed}）" if passed > 0 else ""
+            pushes.append((group_id, f"*{name}* 即將出現{suffix}"))
+    return updates, pushes
+
+
+def run_reminders(store, now, send, window_seconds=None):
+    # 回傳成功送出的提醒數
+    if window_seconds is None:
+        window_seconds = REMINDER_WINDOW_SECONDS
+    rows = store.fetch_due(now + timedelta(seconds=window_seconds))
+    updates, pushes = plan_reminders(rows, now, window_seconds)
+
+    # ✅ 寫回資料庫，更新為最新的下一次時間點
+    if updates:
+        store.update_respawn(updates)
+
+    sent = 0
+    for group_id, msg in pushes:
+        try:
+            send(group_id, msg)
+            sent += 1
+        except Exception as e:
+            print(f"❌ 提醒失敗：{e}")
+    return sent
+
+
+class PostgresTaskStore:
+    # read_connect：到期掃描用的連線（可指向唯讀副本）；回寫一律用 connect（主庫），需要時才連線
+    def __init__(self, connect, read_connect=None):
+        self.connect = connect
+        self.read_conn = (read_connect or connect)()
+        self.conn = None if read_connect else self.read_conn
+
+    def fetch_due(self, until):
+        cursor = self.read_conn.cursor()
+        cursor.execute(DUE_TASKS_SQL, (until,))
+        rows = cursor.fetchall()
+        cursor.close()
+        self.read_conn.rollback()
+        return rows
+
+    def update_respawn(self, updates):
+        if self.conn is None:
+            self.conn = self.connect()
+        cursor = self.conn.cursor()
+        cursor.executemany("""
+            UPDATE boss_tasks
+            SET respawn_time = %s
+            WHERE id = %s
+        """, [(next_respawn, task_id) for task_id, _, next_respawn in updates])
+        self.conn.commit()
+        cursor.close()
+        for group_id in {group_id for _, group_id, _ in updates}:
+            state.bump_group(group_id)
+
+    def close(self):
+        self.read_conn.close()
+        if self.conn is not None and self.conn is not self.read_conn:
+            self.conn.close()
@@ -0,0 +1,218 @@
+# boss_tasks 歷史保留與壓縮
+# boss_tasks 依 kill_time 按月分割（boss_tasks_pYYYYMM），擊殺時不再刪除舊紀錄，而是把舊的標成 superseded；
+# 每個 (群組, BOSS) 只有一筆 NOT superseded 的「目前紀錄」，kb all / reminder_job / /api/boards 只看這一筆。
+# compaction_job 每天執行：預先建立未來的分割，並把超過 BOSS_TASKS_RETENTION_DAYS 的整個月份分割
+# 一次 DETACH 後 DROP（BOSS_TASKS_ARCHIVE=1 時改名保留為 boss_tasks_archive_YYYYMM）；
+# 只清歷史，分割裡的目前紀錄會先搬到預設分割保留下來。
+import os
+import re
+from datetime import datetime, timedelta
+
+from commands import TZ
+
+
+RETENTION_DAYS = int(os.getenv("BOSS_TASKS_RETENTION_DAYS", 90))
+ARCHIVE = os.getenv("BOSS_TASKS_ARCHIVE", "0") == "1"
+MONTHS_AHEAD = 2
+
+PARTITION_RE = re.compile(r"^boss_tasks_p(\d{4})(\d{2})$")
+
+BOSS_TASKS_DDL = """
+    CREATE TABLE IF NOT EXISTS boss_tasks (
+        id BIGSERIAL,
+        boss_id INTEGER REFERENCES boss_list(id) ON DELETE CASCADE,
+        group_id VARCHAR(255) NOT NULL,
+        kill_time TIMESTAMP NOT NULL,
+        respawn_time TIMESTAMP NOT NULL,
+        superseded BOOLEAN NOT NULL DEFAULT FALSE,
+        PRIMARY KEY (id, kill_time)
+    ) PARTITION BY RANGE (kill_time);
+
+    CREATE TABLE IF NOT EXISTS boss_tasks_default PARTITION OF boss_tasks DEFAULT;
+
+    -- 每個 (群組, BOSS) 的目前紀錄：kb all、alias list、擊殺時標記 superseded、/api/boards
+    CREATE INDEX IF NOT EXISTS idx_boss_tasks_current
+        ON boss_tasks (group_id, boss_id) INCLUDE (id, kill_time, respawn_time)
+        WHERE NOT superseded;
+
+    -- reminder_job 只撈即將到期（或已過期）的目前紀錄
+    CREATE INDEX IF NOT EXISTS idx_boss_tasks_due
+        ON boss_tasks (respawn_time) INCLUDE (group_id, boss_id)
+        WHERE NOT superseded;
+
+    -- clear all 與依群組查歷史
+    CREATE INDEX IF NOT EXISTS idx_boss_tasks_group_kill
+        ON boss_tasks (group_id, kill_time DESC);
+"""
+
+
+def _month_start(dt):
+    return datetime(dt.year, dt.month, 1)
+
+
+def _next_month(dt):
+    return datetime(dt.year + dt.month // 12, dt.month % 12 + 1, 1)
+
+
+def _partition_name(month):
+    return f"boss_tasks_p{month.year:04d}{month.month:02d}"
+
+
+# 每個 worker 啟動都會跑 ensure_schema，壓縮也會建分割：同一把交易層級的 advisory lock 讓它們依序執行，
+# 後到的 worker 會看到前一個已經建好（或已搬完）的結果
+SCHEMA_LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtext('boss_tasks_schema'))"
+
+
+def ensure_schema(conn):
+    """
+    建立分割後的 boss_tasks；若還是舊的一般資料表，就在同一個交易內搬成分割表。
+    """
+    cursor = conn.cursor()
+    cursor.execute(SCHEMA_LOCK_SQL)
+    cursor.execute("""
+        SELECT c.relkind FROM pg_class c
+        WHERE c.relname = 'boss_tasks' AND pg_table_is_visible(c.oid)
+    """)
+    row = cursor.fetchone()
+
+    if row and row[0] == "r":
+        print("🚚 將 boss_tasks 轉換為分割表")
+        cursor.execute("ALTER TABLE boss_tasks RENAME TO boss_tasks_legacy")
+        cursor.execute("ALTER TABLE boss_tasks_legacy RENAME CONSTRAINT boss_tasks_pkey TO boss_tasks_legacy_pkey")
+        cursor.execute("ALTER SEQUENCE IF EXISTS boss_tasks_id_seq RENAME TO boss_tasks_legacy_id_seq")
+        cursor.execute("DROP INDEX IF EXISTS idx_boss_tasks_respawn_time")
+        cursor.execute(BOSS_TASKS_DDL)
+
+        cursor.execute("SELECT MIN(kill_time) FROM boss_tasks_legacy")
+        oldest = cursor.fetchone()[0]
+        ensure_partitions(conn, oldest)
+        # 舊表靠 DELETE-before-INSERT 維持每組一筆，搬過來全部都是目前紀錄
+        cursor.execute("""
+            INSERT INTO boss_tasks (id, boss_id, group_id, kill_time, respawn_time)
+            SELECT id, boss_id, group_id, kill_time, respawn_time FROM boss_tasks_legacy
+        """)
+        cursor.execute("SELECT setval('boss_tasks_id_seq', COALESCE((SELECT MAX(id) FROM boss_tasks), 0) + 1, false)")
+        cursor.execute("DROP TABLE boss_tasks_legacy")
+    else:
+        cursor.execute(BOSS_TASKS_DDL)
+        ensure_partitions(conn)
+
+    conn.commit()
+    cursor.close()
+
+
+def ensure_partitions(conn, since=None):
+    # 建立 since（預設本月）到未來 MONTHS_AHEAD 個月的月份分割；呼叫端負責 commit
+    now = datetime.now(TZ).replace(tzinfo=None)
+    month = _month_start(since or now)
+    last = _month_start(now)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+
+    cursor = conn.cursor()
+    created = []
+    while month <= last:
+        upper = _next_month(month)
+        name = _partition_name(month)
+        cursor.execute("SELECT to_regclass(%s)", (name,))
+        if cursor.fetchone()[0] is None:
+            _create_partition(cursor, name, month, upper)
+            created.append(name)
+        month = upper
+    cursor.close()
+    return created
+
+
+def _create_partition(cursor, name, lower, upper):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM boss_tasks_default WHERE kill_time >= %s AND kill_time < %s)",
+        (lower, upper)
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(
+            f"CREATE TABLE {name} PARTITION OF boss_tasks FOR VALUES FROM (%s) TO (%s)",
+            (lower, upper)
+        )
+        return
+
+    # 預設分割裡已經有這個月份的資料：先建獨立表、把資料搬過去，再掛回來
+    cursor.execute(f"CREATE TABLE {name} (LIKE boss_tasks INCLUDING DEFAULTS)")
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM boss_tasks_default
+            WHERE kill_time >= %s AND kill_time < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (lower, upper))
+    cursor.execute(
+        f"ALTER TABLE boss_tasks ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+        (lower, upper)
+    )
+
+
+def compact(conn, retention_days=None, archive=None):
+    """
+    只清歷史：整個月份都早於保留期限的分割，先把其中的目前紀錄（NOT superseded）搬到預設分割，
+    再 DETACH 後 DROP（或改名封存）；預設分割裡過期的也只刪 superseded 的紀錄。
+    很久沒再擊殺的 BOSS 仍由 reminder_job 持續推算重生，目前紀錄不能跟著歷史一起清掉。
+    回傳 (處理的分割名稱, 預設分割刪除筆數)。
+    """
+    retention_days = RETENTION_DAYS if retention_days is None else retention_days
+    archive = ARCHIVE if archive is None else archive
+    cutoff = datetime.now(TZ).replace(tzinfo=None) - timedelta(days=retention_days)
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'boss_tasks'::regclass
+    """)
+    expired = []
+    for (name,) in cursor.fetchall():
+        m = PARTITION_RE.match(name)
+        if m and _next_month(datetime(int(m.group(1)), int(m.group(2)), 1)) <= cutoff:
+            expired.append(name)
+
+    for name in sorted(expired):
+        cursor.execute(f"ALTER TABLE boss_tasks DETACH PARTITION {name}")
+        # DETACH 後這個月份不再有對應分割，搬回 boss_tasks 的目前紀錄會落到預設分割
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {name} WHERE NOT superseded RETURNING *
+            )
+            INSERT INTO boss_tasks SELECT * FROM moved
+        """)
+        if archive:
+            cursor.execute(f"ALTER TABLE {name} RENAME TO {name.replace('boss_tasks_p', 'boss_tasks_archive_')}")
+        else:
+            cursor.execute(f"DROP TABLE {name}")
+
+    cursor.execute(
+        "DELETE FROM boss_tasks_default WHERE kill_time < %s AND superseded",
+        (cutoff,)
+    )
+    default_deleted = cursor.rowcount
+
+    conn.commit()
+    cursor.close()
+    return expired, default_deleted
+
+
+def compaction_job(connect):
+    try:
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SCHEMA_LOCK_SQL)
+            cursor.close()
+            created = ensure_partitions(conn)
+            conn.commit()
+            expired, default_deleted = compact(conn)
+        finally:
+            conn.close()
+        action = "封存" if ARCHIVE else "刪除"
+        print(f"🧹 boss_tasks 壓縮完成：新增分割 {created or '無'}，{action}分割 {expired or '無'}，預設分割清除 {default_deleted} 筆")
+    except Exception as e:
+        print("❌ boss_tasks 壓縮失敗：", e)
@@ -0,0 +1,98 @@
+# 啟動時的資料庫初始化（SEED_ON_STARTUP=1，app.create_app 與 asgi_app 的 lifespan 共用）
+#   清理重複的 boss_aliases、匯入 boss_list.json、建立 boss_tasks 分割表與 group_boss_usage
+# 每個 worker 啟動都會執行，各步驟在交易開頭取 advisory lock，同時啟動的 worker 會依序執行
+import json
+
+import boss_usage
+import retention
+import state
+from db import get_db_connection
+
+
+def seed_on_startup():
+    cleanup_boss_aliases()
+    auto_insert_boss_list()
+    conn = get_db_connection()
+    try:
+        retention.ensure_schema(conn)
+        boss_usage.ensure_schema(conn)
+    finally:
+        conn.close()
+
+
+# 自動清理重複 boss_aliases 並建立唯一索引
+def cleanup_boss_aliases():
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('boss_aliases_seed'))")
+        cursor.execute("""
+            DELETE FROM boss_aliases a
+            USING boss_aliases b
+            WHERE a.id < b.id
+              AND a.boss_id = b.boss_id
+              AND a.keyword = b.keyword
+        """)
+        cursor.execute("""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_indexes WHERE indexname = 'unique_boss_keyword'
+                ) THEN
+                    CREATE UNIQUE INDEX unique_boss_keyword ON boss_aliases(boss_id, keyword);
+                END IF;
+            END$$;
+        """)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        print("✅ 已清除重複 boss_aliases\n✅ 已建立唯一索引")
+
+    except Exception as e:
+        print("❌ 清理/索引建立失敗：", e)
+
+
+# 自動匯入 boss_list.json 資料
+def auto_insert_boss_list():
+    print("🚀 執行 BOSS 自動匯入")
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    with open("boss_list.json", "r", encoding="utf-8") as f:
+        bosses = json.load(f)
+
+    # 與 cleanup_boss_aliases 同一把鎖：其他 worker 匯入完才清空重來，不會交錯寫入
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('boss_aliases_seed'))")
+
+    # 清空舊有資料
+    cursor.execute("DELETE FROM boss_aliases")
+    print("✅ 已清除 boss_aliases 資料")
+
+    for boss in bosses:
+        display_name = boss["display_name"]
+        respawn_hours = boss["respawn_hours"]
+        keywords = boss["keywords"]
+
+        # 新增 boss 主資料
+        cursor.execute("""
+            INSERT INTO boss_list (display_name, respawn_hours)
+            VALUES (%s, %s)
+            ON CONFLICT (display_name)
+            DO UPDATE SET respawn_hours = EXCLUDED.respawn_hours
+            RETURNING id
+        """, (display_name, respawn_hours))
+        boss_id = cursor.fetchone()[0]
+
+        # 新增對應 keyword
+        for keyword in keywords:
+            cursor.execute("""
+                INSERT INTO boss_aliases (boss_id, keyword)
+                VALUES (%s, %s)
+                ON CONFLICT DO NOTHING
+            """, (boss_id, keyword.lower()))
+
+    conn.commit()
+    cursor.close()
+    conn.close()
+    state.bump_aliases()
+    print("✅ BOSS 資料匯入完成")
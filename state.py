@@ -0,0 +1,96 @@
+# 行程內的狀態：各群組的資料版本號與排程執行狀態（供 /api 快取與 ETag 使用）
+# 版本號只存在本行程記憶體中，重啟後歸零；BOOT_ID 讓重啟前後的 ETag 不會相撞
+# 同時記錄最後寫入時間，供 db.get_read_connection 判斷是否要改讀主庫（read-your-writes）
+import threading
+import time
+import uuid
+
+
+BOOT_ID = uuid.uuid4().hex[:8]
+
+_lock = threading.Lock()
+_group_versions = {}
+_global_version = 0
+_usage_versions = {}   # 群組「用過的 BOSS」集合的版本號（boss_usage 卡片快取用）
+_group_epochs = {}     # 群組被 clear all 的次數（擊殺去重用，其他寫入不影響）
+_alias_version = 0
+_written_at = {}       # group_id -> 最後寫入的 time.monotonic()
+_any_written_at = 0.0
+_aliases_written_at = 0.0
+
+scheduler_status = {
+    "interval_seconds": 60,
+    "runs": 0,
+    "last_started_at": None,
+    "last_duration_ms": None,
+    "last_pushes": 0,
+    "last_error": None,
+}
+
+
+def bump_group(group_id):
+    # 群組的 boss_tasks 有任何寫入（擊殺、clear all、重生時間回寫）都要呼叫
+    global _global_version, _any_written_at
+    now = time.monotonic()
+    with _lock:
+        _group_versions[group_id] = _group_versions.get(group_id, 0) + 1
+        _global_version += 1
+        _written_at[group_id] = _any_written_at = now
+
+
+def group_version(group_id):
+    return _group_versions.get(group_id, 0)
+
+
+def global_version():
+    return _global_version
+
+
+def bump_group_epoch(group_id):
+    # 只有 clear all 呼叫：清除前回覆過的擊殺不能再沿用
+    with _lock:
+        _group_epochs[group_id] = _group_epochs.get(group_id, 0) + 1
+
+
+def group_epoch(group_id):
+    return _group_epochs.get(group_id, 0)
+
+
+def bump_group_usage(group_id):
+    # 群組第一次擊殺某隻 BOSS、clear all、壓縮移除 BOSS 時呼叫
+    with _lock:
+        _usage_versions[group_id] = _usage_versions.get(group_id, 0) + 1
+
+
+def group_usage_version(group_id):
+    return _usage_versions.get(group_id, 0)
+
+
+def bump_aliases():
+    # boss_aliases 有任何寫入（alias add/del、啟動時重新匯入）都要呼叫
+    global _alias_version, _aliases_written_at
+    with _lock:
+        _alias_version += 1
+        _aliases_written_at = time.monotonic()
+
+
+def alias_version():
+    return _alias_version
+
+
+def last_write(group_ids=None):
+    # group_ids 中最後一次寫入的 time.monotonic()（別名變更影響所有群組）；None 表示任何群組
+    if group_ids is None:
+        latest = _any_written_at
+    else:
+        latest = max((_written_at.get(g, 0.0) for g in group_ids), default=0.0)
+    return max(latest, _aliases_written_at)
+
+
+def record_reminder_run(started_at, duration_ms, pushes, error=None):
+    with _lock:
+        scheduler_status["runs"] += 1
+        scheduler_status["last_started_at"] = started_at.isoformat()
+        scheduler_status["last_duration_ms"] = round(duration_ms, 1)
+        scheduler_status["last_pushes"] = pushes
+        scheduler_status["last_error"] = error
@@ -0,0 +1,212 @@
+# 唯讀 JSON 狀態 API（取代原本的 /debug-respawn HTML 頁面）
+#   GET /api/status                               排程狀態、唯讀副本狀態
+#   GET /api/boards?group_id=C...&page=1&per_page=20  各群組重生表 + 誤差統計
+# 回應帶 ETag（由群組資料版本號推導），If-None-Match 相符時回 304；
+# 版本號沒變、且還沒有 BOSS 跨過下一次重生時間時，直接回快取，不查資料庫也不重新序列化；
+# 版本號只反映本行程的寫入，其他 worker／行程的寫入最多 API_CACHE_TTL_SECONDS 後才會反映
+# 會列出所有群組 ID 與擊殺紀錄，需設定 API_TOKEN 才會啟用，請求需帶 X-Api-Token 標頭
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, abort, request
+
+import state
+from commands import TZ, to_taipei
+import db
+
+
+api_bp = Blueprint("api", __name__, url_prefix="/api")
+
+MAX_PER_PAGE = 100
+CACHE_SIZE = int(os.getenv("API_CACHE_SIZE", 256))
+CACHE_TTL_SECONDS = float(os.getenv("API_CACHE_TTL_SECONDS", 30))
+
+# key -> (versions, valid_until, etag, body)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _check_token():
+    token = os.getenv("API_TOKEN")
+    if not token:
+        abort(404)
+    given = request.headers.get("X-Api-Token", "")
+    if not hmac.compare_digest(given.encode("utf-8"), token.encode("utf-8")):
+        abort(403)
+
+
+@api_bp.before_request
+def _require_token():
+    _check_token()
+
+
+def _json_response(body, etag):
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@api_bp.route("/status", methods=["GET"])
+def status():
+    snapshot = dict(state.scheduler_status)
+    replica = dict(db.replica_status)
+    etag = f"{state.BOOT_ID}-s{snapshot['runs']}-g{state.global_version()}-r{replica['checked_at']}"
+    if request.if_none_match.contains_weak(etag):
+        return _json_response(b"", etag)
+
+    body = json.dumps({
+        "boot_id": state.BOOT_ID,
+        "global_version": state.global_version(),
+        "scheduler": snapshot,
+        "read_replica": replica,
+    }, ensure_ascii=False)
+    return _json_response(body, etag)
+
+
+@api_bp.route("/boards", methods=["GET"])
+def boards():
+    group_ids = sorted({
+        g.strip()
+        for value in request.args.getlist("group_id")
+        for g in value.split(",") if g.strip()
+    })
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 20, type=int), 1), MAX_PER_PAGE)
+
+    key = (tuple(group_ids), page, per_page)
+    if group_ids:
+        versions = tuple(state.group_version(g) for g in group_ids)
+    else:
+        versions = (state.global_version(),)
+
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry and entry[0] == versions and time.time() < entry[1]:
+            _cache.move_to_end(key)
+        else:
+            entry = None
+
+    if entry is None:
+        payload, valid_until = _build_boards(group_ids, page, per_page)
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        # 內容也要算進去：其他 worker 寫入後，版本號相同但內容不同
+        digest = hashlib.sha1(repr((key, versions, valid_until)).encode("utf-8") + body).hexdigest()[:16]
+        valid_until = min(valid_until, time.time() + CACHE_TTL_SECONDS)
+        entry = (versions, valid_until, f"{state.BOOT_ID}-{digest}", body)
+        with _cache_lock:
+            _cache[key] = entry
+            _cache.move_to_end(key)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    return _json_response(entry[3], entry[2])
+
+
+def _build_boards(group_ids, page, per_page):
+    offset = (page - 1) * per_page
+    # 快取以版本號為鍵，剛寫入的群組一定要讀主庫，否則舊資料會被存成新版本
+    conn = db.get_read_connection(group_ids or None)
+    cursor = conn.cursor()
+    try:
+        if group_ids:
+            total = len(group_ids)
+            page_groups = group_ids[offset:offset + per_page]
+        else:
+            cursor.execute("SELECT COUNT(DISTINCT group_id) FROM boss_tasks WHERE NOT superseded")
+            total = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT DISTINCT group_id FROM boss_tasks
+                WHERE NOT superseded
+                ORDER BY group_id
+                LIMIT %s OFFSET %s
+            """, (per_page, offset))
+            page_groups = [row[0] for row in cursor.fetchall()]
+
+        rows = []
+        if page_groups:
+            # 每個群組每隻 BOSS 只取目前紀錄
+            cursor.execute("""
+                SELECT DISTINCT ON (t.group_id, t.boss_id)
+                    t.group_id,
+                    b.display_name,
+                    t.kill_time,
+                    t.respawn_time,
+                    b.respawn_hours
+                FROM boss_tasks t
+                JOIN boss_list b ON t.boss_id = b.id
+                WHERE t.group_id = ANY(%s) AND NOT t.superseded
+                ORDER BY t.group_id, t.boss_id, t.kill_time DESC, t.id DESC
+            """, (page_groups,))
+            rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    now = datetime.now(TZ)
+    by_group = {g: [] for g in page_groups}
+    valid_until = float("inf")
+    for group_id, name, kill_time, respawn_time, respawn_hours in rows:
+        entry = _board_entry(name, kill_time, respawn_time, respawn_hours, now)
+        by_group[group_id].append(entry)
+        valid_until = min(valid_until, entry.pop("_next_epoch"))
+
+    groups = []
+    for group_id in page_groups:
+        board = sorted(by_group[group_id], key=lambda e: e["next_respawn"])
+        drifts = [abs(e["drift_seconds"]) for e in board]
+        groups.append({
+            "group_id": group_id,
+            "version": state.group_version(group_id),
+            "board": board,
+            "drift": {
+                "count": len(drifts),
+                "max_abs_seconds": max(drifts) if drifts else 0,
+                "mean_abs_seconds": round(sum(drifts) / len(drifts), 1) if drifts else 0,
+            },
+        })
+
+    payload = {
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "groups": groups,
+    }
+    return payload, valid_until
+
+
+def _board_entry(name, kill_time, respawn_time, respawn_hours, now):
+    kill_time = to_taipei(kill_time)
+    respawn_time = to_taipei(respawn_time)
+    period = timedelta(hours=respawn_hours)
+
+    # 下一次重生：第一個不早於現在的 kill_time + n 個週期
+    next_respawn = kill_time + period
+    passed = 0
+    if next_respawn < now:
+        passed = -(-(now - next_respawn) // period)
+        next_respawn += passed * period
+
+    # 誤差：資料庫中的 respawn_time 應剛好落在 kill_time 之後的整數個週期上
+    actual_seconds = (respawn_time - kill_time).total_seconds()
+    cycles = max(round(actual_seconds / period.total_seconds()), 1)
+    drift_seconds = actual_seconds - cycles * period.total_seconds()
+
+    return {
+        "boss": name,
+        "kill_time": kill_time.isoformat(),
+        "respawn_time": respawn_time.isoformat(),
+        "respawn_hours": respawn_hours,
+        "next_respawn": next_respawn.isoformat(),
+        "passed": passed,
+        "actual_hours": round(actual_seconds / 3600, 2),
+        "hour_difference": round(actual_seconds / 3600 - respawn_hours, 2),
+        "drift_seconds": drift_seconds,
+        "_next_epoch": next_respawn.timestamp(),
+    }